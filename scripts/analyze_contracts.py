@@ -4,41 +4,124 @@ https://github.com/ConsenSys/python-solidity-parser
 to process inline assembly in a Solidity file.
 """
 import argparse
+import bisect
+import io
+import multiprocessing
 import os
 import json
+import re
+import signal
+import socketserver
+import sys
 import statistics
 import itertools
+import operator
+import time
+
+from array import array
 
 from collections import defaultdict
 
-from library.assembly_types import OPCODES, OLD_OPCODES, \
-    HIGH_LEVEL_CONSTRUCTS, DECLARATIONS, SPECIAL
+from library.assembly_types import INSTRUCTION_IDS, INSTRUCTION_NAMES, \
+    INSTRUCTION_RANGES, CONSTRUCTS, CONSTRUCT_IDS, TOTAL_COUNTERS
+from library.budget import Budget, BudgetExceeded, Quarantine, \
+    get_quarantined_files
+from library.cache import ParseCache, FragmentMemo
+from library.dfa import load_dfa, save_dfa, count_dfa_states
+from library.profiler import Profiler, new_profile, reset_peak_rss, \
+    get_peak_rss, summarize_profile
+from library.results import write_results, write_results_jsonl, is_jsonl
+from library.scheduling import order_largest_first
+from library.sources import read_code
+from library.tokenizer import tokenize, is_plain_identifier
+from library.yul import parse_assembly
 
 from antlr4 import *
 from antlr4.InputStream import InputStream
+from antlr4.ListTokenSource import ListTokenSource
 from antlr4 import FileStream, CommonTokenStream
+from antlr4.atn.PredictionMode import PredictionMode
+from antlr4.error.ErrorStrategy import BailErrorStrategy
+from antlr4.error.Errors import ParseCancellationException
 from solidity_parser.solidity_antlr4.SolidityLexer import SolidityLexer
 from solidity_parser.solidity_antlr4.SolidityParser import SolidityParser
 from solidity_parser.solidity_antlr4.SolidityVisitor import SolidityVisitor
 
 
+# Bump it whenever the results of a parser backend (or how they are pickled)
+# change, so that the results of older versions in a ParseCache are not reused.
+PARSER_VERSION = 3
+
+
 def _get_loc(ctx):
+        return _get_tokens_loc(ctx.start, ctx.stop)
+
+
+def _get_tokens_loc(start, stop):
         return {
             'start': {
-                'line': ctx.start.line,
-                'column': ctx.start.column
+                'line': start.line,
+                'column': start.column
             },
             'end': {
-                'line': ctx.stop.line,
-                'column': ctx.stop.column
+                'line': stop.line,
+                'column': stop.column
             }
         }
 
 
 def _get_text(ctx):
+    return _get_span_text(_get_span(ctx))
+
+
+def _get_span(ctx):
+    """
+    Return the source code of ctx's input stream and the offsets of the
+    first and last character of ctx, so that its text can be built later
+    with _get_span_text. Only the string is kept, not the input stream.
+    """
     token_source = ctx.start.getTokenSource()
-    input_stream = token_source.inputStream
-    return input_stream.getText(ctx.start.start, ctx.stop.stop)
+    return token_source.inputStream.strdata, ctx.start.start, ctx.stop.stop
+
+
+def _get_token_texts(ctx):
+    """Return the texts of the tokens of ctx, without comments."""
+    tokens = ctx.parser.getTokenStream().tokens
+    first, last = ctx.start.tokenIndex, ctx.stop.tokenIndex
+    return [t.text for t in tokens[first:last + 1]
+            if t.channel == Token.DEFAULT_CHANNEL]
+
+
+def _get_span_text(span):
+    text, start, stop = span
+    return text[start:stop + 1]
+
+
+def _get_byte_offsets(text, raw, offsets):
+    """
+    Return a dict that maps the sorted character offsets of text to the
+    byte offsets of raw, the contents of the file that text was read from
+    (i.e., decoded from UTF-8 with universal newlines), or of text encoded
+    to UTF-8 if raw is None.
+    """
+    source = text if raw is None else raw.decode('utf-8')
+    # The offsets (in text) of the newlines that were "\r\n" in source
+    crlf = []
+    if raw is not None and '\r\n' in source:
+        i = source.find('\r\n')
+        while i != -1:
+            crlf.append(i - len(crlf))
+            i = source.find('\r\n', i + 2)
+    if source.isascii() and not crlf:
+        return {o: o for o in offsets}
+    res = {}
+    prev, prev_bytes = 0, 0
+    for o in offsets:
+        i = o + bisect.bisect_left(crlf, o)
+        prev_bytes += len(source[prev:i].encode('utf-8'))
+        prev = i
+        res[o] = prev_bytes
+    return res
 
 
 def _compute_lines(loc):
@@ -48,11 +131,20 @@ def _compute_lines(loc):
 class Node(dict):
     """
     provide a dict interface and object attrib access
+
+    The "text" of a node is built from the input stream only when it is
+    accessed.
     """
     def __init__(self, ctx, **kwargs):
         for k, v in kwargs.items():
             self[k] = v
-        self["text"] = Node._get_text(ctx)
+        object.__setattr__(self, '_span', _get_span(ctx))
+
+    def __missing__(self, key):
+        if key != "text":
+            raise KeyError(key)
+        text = self["text"] = _get_span_text(self._span)
+        return text
 
     def __getattr__(self, item):
         return self[item]  # raise exception if attribute does not exist
@@ -74,6 +166,18 @@ class Contract:
         self.computed_total_lines = 0
         self.functions = 0  # funcs + modifiers
         self.functions_with_inline_assembly = 0
+        # Running totals of the counters and lines of the fragments
+        self.counters = array('Q', EMPTY_COUNTERS)
+        self.assembly_lines = 0
+
+    def add_fragment(self, fragment):
+        """
+        Add a fragment whose instructions and constructs have all been
+        counted, i.e., after it has been visited.
+        """
+        self.fragments.append(fragment)
+        self.counters = _add_counters(self.counters, fragment.counters)
+        self.assembly_lines += fragment.get_total_lines()
 
     def get_name(self):
         return self.name
@@ -88,7 +192,7 @@ class Contract:
         return _compute_lines(self.lines)
 
     def get_total_assembly_lines(self):
-        return sum(_compute_lines(f['loc']) for f in self.fragments)
+        return self.assembly_lines
 
     def get_total_functions(self):
         return self.functions
@@ -96,62 +200,57 @@ class Contract:
     def get_total_functions_with_inline_assembly(self):
         return self.functions_with_inline_assembly
 
+    def count(self, construct):
+        return self.counters[CONSTRUCT_IDS[construct]]
+
     def get_total_inline_functions(self):
-        return sum(len(f['functions']) for f in self.fragments)
+        return self.count('functions')
 
     def get_total_definitions(self):
-        return sum(len(f['definitions']) for f in self.fragments)
+        return self.count('definitions')
 
     def get_declarations(self):
-        res = [('let', self.get_total_definitions()),
-               ('function', self.get_total_inline_functions())]
-        return {decl: value for decl, value in res if value > 0}
+        return _get_declarations(self.counters)
 
     def get_total_label_definitions(self):
-        return sum(len(f['label_definitions']) for f in self.fragments)
+        return self.count('label_definitions')
 
     def get_total_assignments(self):
-        return sum(len(f['assignments']) for f in self.fragments)
+        return self.count('assignments')
 
     def get_total_if(self):
-        return sum(len(f['if_stmts']) for f in self.fragments)
+        return self.count('if_stmts')
 
     def get_total_for(self):
-        return sum(len(f['for_stmts']) for f in self.fragments)
+        return self.count('for_stmts')
 
     def get_total_switch(self):
-        return sum(len(f['switch_stmts']) for f in self.fragments)
+        return self.count('switch_stmts')
+
+    def get_counters(self):
+        return self.counters
 
     def get_opcodes(self):
-        results = defaultdict(lambda: 0)
-        for f in self.fragments:
-            for opcode, value in f['calls_counter']['OPCODES'].items():
-                results[opcode] += value
-        return results
+        return _get_instructions(self.counters, 'OPCODES')
 
     def get_old_opcodes(self):
-        results = defaultdict(lambda: 0)
-        for f in self.fragments:
-            for opcode, value in f['calls_counter']['OLD_OPCODES'].items():
-                results[opcode] += value
-        return results
+        return _get_instructions(self.counters, 'OLD_OPCODES')
 
     def get_special_opcodes(self):
-        results = defaultdict(lambda: 0)
-        for f in self.fragments:
-            for opcode, value in f['calls_counter']['SPECIAL'].items():
-                results[opcode] += value
-        return results
+        return _get_instructions(self.counters, 'SPECIAL')
 
     def get_high_level_constructs(self):
-        res = [(construct, getattr(Contract, 'get_total_' + construct)(self))
-               for construct in ['if', 'switch', 'for']]
-        return {contstruct: value for contstruct, value in res if value > 0}
+        return _get_high_level_constructs(self.counters)
 
     def has_assembly(self):
         return self.get_total_fragments() > 0
 
-    def to_json_results(self, include_code=False):
+    def to_json_results(self, include_code=False, fragment_code=False,
+                        path=None):
+        """
+        The code of the fragments is included with fragment_code (read from
+        the file path if it has been discarded).
+        """
         res = {
             'stats': {
                 'lines': self.get_total_lines(),
@@ -166,7 +265,7 @@ class Contract:
                 'high-level constructs': self.get_high_level_constructs(),
                 'declarations': self.get_declarations()
             },
-            'fragments': [f.to_json_results(include_code)
+            'fragments': [f.to_json_results(fragment_code, path)
                           for f in self.fragments]
         }
         if include_code:
@@ -174,42 +273,101 @@ class Contract:
         return res
 
 
-class InlineAssemblyFragment(dict):
+def _add_counters(total, counters):
+    """Add the counter array counters to total element-wise."""
+    return array('Q', map(operator.add, total, counters))
 
-    def __init__(self, ctx, **kwargs):
-        for k, v in kwargs.items():
-            self[k] = v
 
-        self['loc'] = InlineAssemblyFragment._get_loc(ctx)
-        self['code'] = InlineAssemblyFragment._get_text(ctx)
+def _get_instructions(counters, category):
+    """
+    Return a dict with the nonzero counters of the instructions of
+    category (OPCODES, OLD_OPCODES, or SPECIAL).
+    """
+    first, last = INSTRUCTION_RANGES[category]
+    return {INSTRUCTION_NAMES[i]: counters[i] for i in range(first, last)
+            if counters[i]}
 
-        self['assignments'] = []
-        self['functions'] = []
-        self['definitions'] = []
-        self['label_definitions'] = []
-        self['if_stmts'] = []
-        self['switch_stmts'] = []
-        self['for_stmts'] = []
-        # instructions
-        self['calls'] = []
 
-        self['calls_counter'] = defaultdict(lambda: defaultdict(lambda: 0))
+def _get_high_level_constructs(counters):
+    res = [(construct, counters[CONSTRUCT_IDS[construct + '_stmts']])
+           for construct in ['if', 'switch', 'for']]
+    return {contstruct: value for contstruct, value in res if value > 0}
 
-    def __getattr__(self, item):
-        return self[item]  # raise exception if attribute does not exist
 
-    def __setattr__(self, name, value):
-        if name == 'calls_counter':
-            if value in OPCODES:
-                self[name]['OPCODES'][value] += 1
-            elif value in OLD_OPCODES:
-                self[name]['OLD_OPCODES'][value] += 1
-            elif value in SPECIAL:
-                self[name]['SPECIAL'][value] += 1
-        elif isinstance(self[name], list):
-            self[name].append(value)
-        else:
-            self[name] = value
+def _get_declarations(counters):
+    res = [('let', counters[CONSTRUCT_IDS['definitions']]),
+           ('function', counters[CONSTRUCT_IDS['functions']])]
+    return {decl: value for decl, value in res if value > 0}
+
+
+# One counter per instruction and construct, see library.assembly_types.
+EMPTY_COUNTERS = array('I', [0]) * TOTAL_COUNTERS
+CALLS = CONSTRUCT_IDS['calls']
+
+
+class InlineAssemblyFragment:
+    """
+    An inline assembly fragment. Its instructions and constructs are counted
+    in one integer array (counters) indexed by the ids of
+    library.assembly_types, and converted to dicts only in to_json_results.
+
+    start and end are the byte offsets of the fragment in its file (end is
+    exclusive). The backends set them to character offsets of the parsed
+    text, which parse_source converts to byte offsets. The code of the
+    fragment is built from the parsed text only when it is accessed, and it
+    is not pickled: it is read back from the file (see library.sources).
+    """
+    __slots__ = ('loc', 'counters', 'start', 'end', '_code', '_span')
+
+    def __init__(self, ctx=None, loc=None, span=None):
+        """span is (text, first offset, last offset) as _get_span."""
+        if ctx is not None:
+            loc = InlineAssemblyFragment._get_loc(ctx)
+            span = _get_span(ctx)
+        self.loc = loc
+        self._span = span
+        self._code = None
+        self.start = span[1] if span is not None else None
+        self.end = span[2] + 1 if span is not None else None
+        self.counters = EMPTY_COUNTERS[:]
+
+    @property
+    def code(self):
+        """The code, or None if the parsed text is not available."""
+        if self._span is not None:
+            self._code = _get_span_text(self._span)
+            self._span = None
+        return self._code
+
+    def get_code(self, path):
+        """Return the code, reading it from the file path if needed."""
+        code = self.code
+        if code is None:
+            code = read_code(path, self.start, self.end)
+        return code
+
+    def add_call(self, name):
+        """Count a call to the instruction or function name."""
+        instruction = INSTRUCTION_IDS.get(name)
+        if instruction is not None:
+            self.counters[instruction] += 1
+        self.counters[CALLS] += 1
+
+    def add(self, construct):
+        """Count a construct of library.assembly_types.CONSTRUCTS."""
+        self.counters[CONSTRUCT_IDS[construct]] += 1
+
+    def count(self, construct):
+        return self.counters[CONSTRUCT_IDS[construct]]
+
+    def __getstate__(self):
+        # Neither the code nor the source code of the whole file
+        return self.loc, self.counters, self.start, self.end
+
+    def __setstate__(self, state):
+        self.loc, self.counters, self.start, self.end = state
+        self._code = None
+        self._span = None
 
     @staticmethod
     def _get_loc(ctx):
@@ -220,30 +378,28 @@ class InlineAssemblyFragment(dict):
         return _get_text(ctx)
 
     def get_total_lines(self):
-        return _compute_lines(self['loc'])
+        return _compute_lines(self.loc)
 
     def get_opcodes(self):
-        return self['calls_counter']['OPCODES']
+        return _get_instructions(self.counters, 'OPCODES')
 
     def get_old_opcodes(self):
-        return self['calls_counter']['OLD_OPCODES']
+        return _get_instructions(self.counters, 'OLD_OPCODES')
 
     def get_special_opcodes(self):
-        return self['calls_counter']['SPECIAL']
+        return _get_instructions(self.counters, 'SPECIAL')
 
     def get_high_level_constructs(self):
-        res = [(construct, len(self[construct + '_stmts']))
-               for construct in ['if', 'switch', 'for']]
-        return {contstruct: value for contstruct, value in res if value > 0}
+        return _get_high_level_constructs(self.counters)
 
     def get_declarations(self):
-        res = [('let', len(self['definitions'])),
-               ('function', len(self['functions']))]
-        return {decl: value for decl, value in res if value > 0}
+        return _get_declarations(self.counters)
 
-    def to_json_results(self, include_code=False):
+    def to_json_results(self, include_code=False, path=None):
+        """With include_code, the code is read from path if needed."""
         res = {
-            'original_lines': self['loc'],
+            'original_lines': self.loc,
+            'original_bytes': {'start': self.start, 'end': self.end},
             'lines': self.get_total_lines(),
             'opcodes': self.get_opcodes(),
             'old opcodes': self.get_old_opcodes(),
@@ -251,8 +407,8 @@ class InlineAssemblyFragment(dict):
             'high-level constructs': self.get_high_level_constructs(),
             'declarations': self.get_declarations()
         }
-        # Always include
-        res['code'] = self.code
+        if include_code:
+            res['code'] = self.get_code(path)
         return res
 
 
@@ -265,16 +421,46 @@ class FileInlineAssemblyData:
         self.contracts = []
         # this class may contain the contracts of multiple files
         self.total_lines = []
+        # Which stage of the two-stage parser succeeded and how long each
+        # stage took (see _parse_tree). None if ANTLR was not used.
+        self.parse_stats = None
+        # The time of each phase etc. with --profile (see library.profiler),
+        # which is not part of the results.
+        self.profile = None
+        # Running totals of the fragments of all the contracts
+        self.counters = array('Q', EMPTY_COUNTERS)
+        self.assembly_lines = 0
+        self.fragments = 0
+        self.contracts_with_inline_assembly = 0
+
+    def add_fragment(self, contract, fragment):
+        """Add a visited fragment to contract (see Contract.add_fragment)."""
+        if not contract.fragments:
+            self.contracts_with_inline_assembly += 1
+        contract.add_fragment(fragment)
+        self.counters = _add_counters(self.counters, fragment.counters)
+        self.assembly_lines += fragment.get_total_lines()
+        self.fragments += 1
 
     def get_contracts(self):
         return self.contracts
 
-    def to_json_results(self, include_code=False):
+    def to_json_results(self, include_code=False, fragment_code=None):
+        """
+        include_code includes the code of the file, and, unless
+        fragment_code is False, the code of the fragments.
+        """
+        if fragment_code is None:
+            fragment_code = include_code
         res = {}
-        res['contracts'] = {c.get_name(): c.to_json_results()
-                            for c in self.contracts}
+        res['contracts'] = {
+            c.get_name(): c.to_json_results(fragment_code=fragment_code,
+                                            path=self.name)
+            for c in self.contracts}
         res['lines'] = self.get_total_lines()
         res['solidity_version'] = self.solidity_version
+        if self.parse_stats is not None:
+            res['parse_stats'] = self.parse_stats
         if include_code:
             res['code'] = self.code
         return res
@@ -291,55 +477,70 @@ class FileInlineAssemblyData:
         return sum(_compute_lines(l) for l in self.total_lines)
 
     def get_total_contracts_with_inline_assembly(self):
-        return sum(1 for c in self.contracts if c.get_total_fragments() > 0)
+        return self.contracts_with_inline_assembly
 
     def get_total_functions_with_inline_assembly(self):
         return sum(c.get_total_functions_with_inline_assembly()
                    for c in self.contracts)
 
     def get_total_assembly_lines(self):
-        return sum(c.get_total_assembly_lines() for c in self.contracts)
+        return self.assembly_lines
 
     def get_total_fragments(self):
-        return sum(c.get_total_fragments() for c in self.contracts)
+        return self.fragments
 
     def get_opcodes(self):
-        res = defaultdict(lambda: 0)
-        for c in self.contracts:
-            for opcode, value in c.get_opcodes().items():
-                res[opcode] += value
-        return res
+        return _get_instructions(self.counters, 'OPCODES')
 
     def get_old_opcodes(self):
-        res = defaultdict(lambda: 0)
-        for c in self.contracts:
-            for opcode, value in c.get_old_opcodes().items():
-                res[opcode] += value
-        return res
+        return _get_instructions(self.counters, 'OLD_OPCODES')
 
     def get_special_opcodes(self):
-        res = defaultdict(lambda: 0)
-        for c in self.contracts:
-            for opcode, value in c.get_special_opcodes().items():
-                res[opcode] += value
-        return res
+        return _get_instructions(self.counters, 'SPECIAL')
 
     def get_high_level_constructs(self):
-        res = defaultdict(lambda: 0)
-        for c in self.contracts:
-            for contstruct, value in c.get_high_level_constructs().items():
-                res[contstruct] += value
-        return res
+        return _get_high_level_constructs(self.counters)
 
     def get_declarations(self):
-        res = defaultdict(lambda: 0)
-        for c in self.contracts:
-            for decl, value in c.get_declarations().items():
-                res[decl] += value
-        return res
+        return _get_declarations(self.counters)
 
     def get_total_definitions(self):
-        return sum(c.get_total_definitions() for c in self.contracts)
+        return self.counters[CONSTRUCT_IDS['definitions']]
+
+    def get_parse_stats(self):
+        return self.parse_stats or {}
+
+    def set_byte_offsets(self, text, raw=None):
+        """
+        Convert the character offsets of the fragments in text to byte
+        offsets in raw, the contents of the file that text was read from,
+        or in text encoded to UTF-8.
+        """
+        fragments = [f for c in self.contracts for f in c.fragments]
+        offsets = _get_byte_offsets(
+            text, raw, sorted({o for f in fragments for o in (f.start, f.end)}))
+        for f in fragments:
+            f.start, f.end = offsets[f.start], offsets[f.end]
+
+    def set_fragment_code(self, text):
+        """
+        Set the code of the fragments (e.g., of cached results) from the
+        text that their byte offsets are offsets of, encoded to UTF-8.
+        """
+        encoded = text.encode('utf-8')
+        for c in self.contracts:
+            for f in c.fragments:
+                f._code = encoded[f.start:f.end].decode('utf-8')
+
+    def discard_code(self):
+        """
+        Drop the code of the file and its contracts, which is only needed
+        for to_json_results(include_code=True). The code of the fragments
+        is never pickled.
+        """
+        self.code = None
+        for c in self.contracts:
+            c.code = None
 
 
 class InlineAssemblyData:
@@ -361,16 +562,261 @@ class InlineAssemblyData:
         else:
             raise Exception("result_type should be sum or dict")
 
-    def to_json_results(self, include_code=False):
-        return {f.name: f.to_json_results(include_code) for f in self.files}
+    def to_json_results(self, include_code=False, fragment_code=None):
+        return {f.name: f.to_json_results(include_code, fragment_code)
+                for f in self.files}
+
+    def get_statistics(self):
+        """Return the InlineAssemblyStatistics of the files."""
+        return InlineAssemblyStatistics(self.files)
+
+
+ADDRESS = re.compile(r'0x[0-9a-fA-F]{40}')
+
+
+def get_address(path):
+    """
+    Return the contract address of the file path, i.e., the last address in
+    path (e.g., sol/0x...sol or assembly/0x.../A.sol), or path itself.
+    """
+    addresses = ADDRESS.findall(path)
+    return addresses[-1].lower() if addresses else path
+
+
+def _get_bucket(value):
+    """The power-of-two histogram bucket of value (its lower bound)."""
+    return 1 << (value.bit_length() - 1) if value > 0 else 0
+
+
+# The names of the counters (see library.assembly_types) in the JSON format
+# of InlineAssemblyStatistics
+COUNTER_NAMES = INSTRUCTION_NAMES + list(CONSTRUCTS)
+COUNTER_IDS = {name: i for i, name in enumerate(COUNTER_NAMES)}
+
+
+class InlineAssemblyStatistics:
+    """
+    The statistics of InlineAssemblyData.compute, computed in a single pass
+    over the files: the totals of each file are added to running totals as
+    soon as it is parsed (add), and converted to dicts only by compute.
+    Hence, the results of the files do not have to be kept in memory.
+
+    It is also a partial aggregate: the statistics of different processes
+    or machines can be saved (to_json), and merged in any order (merge).
+    Besides the totals, it keeps per-address histograms, e.g., how many
+    addresses have N fragments. The files of an address must be added one
+    after the other, and by a single InlineAssemblyStatistics.
+    """
+    SUMS = (
+        'get_total_contracts',
+        'get_total_functions',
+        'get_total_lines',
+        'get_total_contracts_with_inline_assembly',
+        'get_total_functions_with_inline_assembly',
+        'get_total_assembly_lines',
+        'get_total_fragments',
+    )
+    DICTS = (
+        'get_opcodes',
+        'get_old_opcodes',
+        'get_high_level_constructs',
+        'get_declarations',
+        'get_parse_stats',
+    )
+    # Per-address histograms, and if their values are bucketed by powers
+    # of two
+    HISTOGRAMS = {
+        'contracts': False,
+        'fragments': False,
+        'lines': True,
+        'assembly_lines': True,
+    }
+    JSON_VERSION = 1
+
+    def __init__(self, files=()):
+        self.files = 0
+        self.addresses = 0
+        self.sums = dict.fromkeys(self.SUMS, 0)
+        self.counters = array('Q', EMPTY_COUNTERS)
+        self.parse_stats = defaultdict(lambda: 0)
+        self.histograms = {name: defaultdict(lambda: 0)
+                           for name in self.HISTOGRAMS}
+        # The address of the last file, and its totals so far
+        self._address = None
+        self._pending = None
+        for data in files:
+            self.add(data)
+
+    def add(self, data):
+        """Add the FileInlineAssemblyData data."""
+        self.files += 1
+        sums = self.sums
+        sums['get_total_contracts'] += len(data.contracts)
+        lines = data.get_total_lines()
+        sums['get_total_lines'] += lines
+        for c in data.contracts:
+            sums['get_total_functions'] += c.functions
+            sums['get_total_functions_with_inline_assembly'] += \
+                c.functions_with_inline_assembly
+        sums['get_total_contracts_with_inline_assembly'] += \
+            data.contracts_with_inline_assembly
+        sums['get_total_assembly_lines'] += data.assembly_lines
+        sums['get_total_fragments'] += data.fragments
+        self.counters = _add_counters(self.counters, data.counters)
+        if data.parse_stats:
+            for k, value in data.parse_stats.items():
+                self.parse_stats[k] += value
+
+        address = get_address(data.name)
+        if address != self._address:
+            self._flush()
+            self._address = address
+            self._pending = dict.fromkeys(self.HISTOGRAMS, 0)
+        pending = self._pending
+        pending['contracts'] += len(data.contracts)
+        pending['fragments'] += data.fragments
+        pending['lines'] += lines
+        pending['assembly_lines'] += data.assembly_lines
+
+    def _flush(self):
+        """Add the totals of the last address to the histograms."""
+        if self._pending is None:
+            return
+        self.addresses += 1
+        for name, bucketed in self.HISTOGRAMS.items():
+            value = self._pending[name]
+            if bucketed:
+                value = _get_bucket(value)
+            self.histograms[name][value] += 1
+        self._address = None
+        self._pending = None
+
+    def get_histograms(self):
+        self._flush()
+        return self.histograms
+
+    def compute(self, name, result_type):
+        if result_type == 'sum':
+            if name == 'get_total_definitions':
+                return self.counters[CONSTRUCT_IDS['definitions']]
+            return self.sums[name]
+        elif result_type == 'dict':
+            if name == 'get_parse_stats':
+                return self.parse_stats
+            if name == 'get_high_level_constructs':
+                return _get_high_level_constructs(self.counters)
+            if name == 'get_declarations':
+                return _get_declarations(self.counters)
+            category = {'get_opcodes': 'OPCODES',
+                        'get_old_opcodes': 'OLD_OPCODES',
+                        'get_special_opcodes': 'SPECIAL'}[name]
+            return _get_instructions(self.counters, category)
+        else:
+            raise Exception("result_type should be sum or dict")
+
+    def merge(self, other):
+        """Add the statistics of other to these, and return them."""
+        self._flush()
+        histograms = other.get_histograms()
+        self.files += other.files
+        self.addresses += other.addresses
+        for name, value in other.sums.items():
+            self.sums[name] += value
+        self.counters = _add_counters(self.counters, other.counters)
+        for k, value in other.parse_stats.items():
+            self.parse_stats[k] += value
+        for name, histogram in histograms.items():
+            for k, value in histogram.items():
+                self.histograms[name][k] += value
+        return self
+
+    def to_json(self):
+        """Return the statistics as a JSON-serializable dict."""
+        histograms = self.get_histograms()
+        return {
+            'version': self.JSON_VERSION,
+            'files': self.files,
+            'addresses': self.addresses,
+            'sums': self.sums,
+            'counters': {COUNTER_NAMES[i]: value
+                         for i, value in enumerate(self.counters) if value},
+            'parse_stats': self.parse_stats,
+            'histograms': {name: {str(k): value
+                                  for k, value in sorted(histogram.items())}
+                           for name, histogram in histograms.items()},
+        }
+
+    @classmethod
+    def from_json(cls, res):
+        """Return the statistics of a dict of to_json."""
+        if res.get('version') != cls.JSON_VERSION:
+            raise ValueError(
+                f"unsupported statistics version {res.get('version')}")
+        stats = cls()
+        stats.files = res['files']
+        stats.addresses = res['addresses']
+        stats.sums.update(res['sums'])
+        for name, value in res['counters'].items():
+            stats.counters[COUNTER_IDS[name]] = value
+        stats.parse_stats.update(res['parse_stats'])
+        for name, histogram in res['histograms'].items():
+            stats.histograms[name].update(
+                (int(k), value) for k, value in histogram.items())
+        return stats
+
+    def save(self, path):
+        """
+        Append the statistics to the JSON lines file path, so that several
+        processes can share it.
+        """
+        # A single write of a whole line, so that appends do not interleave
+        with open(path, 'a') as f:
+            f.write(json.dumps(self.to_json()) + '\n')
+
+
+def load_statistics(paths):
+    """Return the merged InlineAssemblyStatistics of JSON lines files."""
+    stats = InlineAssemblyStatistics()
+    for path in paths:
+        with open(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    stats.merge(
+                        InlineAssemblyStatistics.from_json(json.loads(line)))
+    return stats
 
 
 class InlineAssemblyVisitor(SolidityVisitor):
 
-    def __init__(self, name=''):
+    # The visit methods that are still used in lean mode, in addition to the
+    # ones of inline assembly (see _is_lean_visit).
+    LEAN_VISITS = frozenset([
+        'visitSourceUnit', 'visitPragmaDirective', 'visitContractDefinition',
+        'visitModifierDefinition', 'visitFunctionDefinition',
+        'visitInlineAssemblyStatement', 'visitLabelDefinition',
+        'visitSubAssembly', 'visitIdentifier', 'visitNumberLiteral',
+        'visitStringLiteral', 'visitHexLiteral'
+    ])
+    # The lean visit methods that build Nodes only inside inline assembly,
+    # since ordinary Solidity uses them too.
+    FRAGMENT_VISITS = ('visitIdentifier', 'visitNumberLiteral',
+                       'visitStringLiteral', 'visitHexLiteral')
+
+    def __init__(self, name='', lean=False, memo=None):
+        """
+        In lean mode, the visitor does not build Node trees outside of
+        inline assembly: it only tracks the boundaries of contracts,
+        functions, and modifiers, and it walks every other subtree with
+        visitChildren.
+
+        With a FragmentMemo, the assembly block of a fragment whose tokens
+        have been seen before is not visited; its counters are reused.
+        """
         super(InlineAssemblyVisitor, self).__init__()
         self.data = FileInlineAssemblyData(name)
         self.contracts = self.data.contracts
+        self.lean = lean
+        self.memo = memo
 
         self._current_fragment = None
 
@@ -378,8 +824,27 @@ class InlineAssemblyVisitor(SolidityVisitor):
 
         self._current_func_mod_has_assembly = None
 
+        if lean:
+            for name in vars(SolidityVisitor):
+                if name.startswith('visit') and not self._is_lean_visit(name):
+                    setattr(self, name, self.visitChildren)
+            for name in self.FRAGMENT_VISITS:
+                setattr(self, name, self._in_fragment(getattr(self, name)))
+
     # start helper functions
 
+    @classmethod
+    def _is_lean_visit(cls, name):
+        return name in cls.LEAN_VISITS or name.startswith('visitAssembly')
+
+    def _in_fragment(self, visit):
+        """Wrap visit to only walk the children outside of fragments."""
+        def lean_visit(ctx):
+            if self._current_fragment is None:
+                return self.visitChildren(ctx)
+            return visit(ctx)
+        return lean_visit
+
     def _mapCommasToNulls(self, children):
         if not children or len(children) == 0:
             return []
@@ -451,6 +916,8 @@ class InlineAssemblyVisitor(SolidityVisitor):
         pragma_value = ctx.pragmaValue().getText()
         if pragma_name == 'solidity':
             self.data.solidity_version = pragma_value
+        if self.lean:
+            return None
         return Node(ctx=ctx,
                     type="PragmaDirective",
                     name=pragma_name,
@@ -465,7 +932,7 @@ class InlineAssemblyVisitor(SolidityVisitor):
 
                 try:
                     alias = item.identifier(1).getText()
-                except:
+                except (AttributeError, IndexError):
                     alias = None
                 symbol_aliases[item.identifier(0).getText()] = alias
 
@@ -491,12 +958,16 @@ class InlineAssemblyVisitor(SolidityVisitor):
         self._current_contract.code = _get_text(ctx)
         self.data.contracts.append(self._current_contract)
 
-        node = Node(ctx=ctx,
-                    type="ContractDefinition",
-                    name=ctx.identifier().getText(),
-                    baseContracts=self.visit(ctx.inheritanceSpecifier()),
-                    subNodes=self.visit(ctx.contractPart()),
-                    kind=ctx.getChild(0).getText())
+        if self.lean:
+            self.visitChildren(ctx)
+            node = None
+        else:
+            node = Node(ctx=ctx,
+                        type="ContractDefinition",
+                        name=ctx.identifier().getText(),
+                        baseContracts=self.visit(ctx.inheritanceSpecifier()),
+                        subNodes=self.visit(ctx.contractPart()),
+                        kind=ctx.getChild(0).getText())
 
         self._current_contract = old_contract
 
@@ -506,16 +977,20 @@ class InlineAssemblyVisitor(SolidityVisitor):
         old = self._current_func_mod_has_assembly
         self._current_func_mod_has_assembly = False
 
-        parameters = []
+        if self.lean:
+            self.visitChildren(ctx)
+            node = None
+        else:
+            parameters = []
 
-        if ctx.parameterList():
-            parameters = self.visit(ctx.parameterList())
+            if ctx.parameterList():
+                parameters = self.visit(ctx.parameterList())
 
-        node = Node(ctx=ctx,
-                    type='ModifierDefinition',
-                    name=ctx.identifier().getText(),
-                    parameters=parameters,
-                    body=self.visit(ctx.block()))
+            node = Node(ctx=ctx,
+                        type='ModifierDefinition',
+                        name=ctx.identifier().getText(),
+                        parameters=parameters,
+                        body=self.visit(ctx.block()))
 
         self._current_contract.functions += 1
         if self._current_func_mod_has_assembly:
@@ -547,6 +1022,9 @@ class InlineAssemblyVisitor(SolidityVisitor):
 
             self._current_contract = self.contracts[-1]
 
+        if self.lean:
+            self.visitChildren(ctx)
+            return self._exit_function_definition(old, old_contract)
 
         fd = ctx.functionDescriptor()
         if fd.ConstructorKeyword():
@@ -597,6 +1075,9 @@ class InlineAssemblyVisitor(SolidityVisitor):
                     isReceive=isReceive,
                     stateMutability=stateMutability)
 
+        return self._exit_function_definition(old, old_contract, node)
+
+    def _exit_function_definition(self, old, old_contract, node=None):
         self._current_contract.functions += 1
         if self._current_func_mod_has_assembly:
             self._current_contract.functions_with_inline_assembly += 1
@@ -611,7 +1092,6 @@ class InlineAssemblyVisitor(SolidityVisitor):
 
         fragment = InlineAssemblyFragment(ctx)
         self._current_fragment = fragment
-        self._current_contract.fragments.append(fragment)
 
         language = None
 
@@ -622,11 +1102,23 @@ class InlineAssemblyVisitor(SolidityVisitor):
         if self._current_func_mod_has_assembly is not None:
             self._current_func_mod_has_assembly = True
 
-        body = self.visit(ctx.assemblyBlock())
+        body = None
+        if self.memo is None:
+            body = self.visit(ctx.assemblyBlock())
+        else:
+            key = self.memo.key(_get_token_texts(ctx))
+            counters = self.memo.get(key)
+            if counters is None:
+                body = self.visit(ctx.assemblyBlock())
+                self.memo.put(key, fragment.counters[:])
+            else:
+                fragment.counters = counters[:]
 
         self._current_fragment = None
-        fragment['body'] = body
+        self.data.add_fragment(self._current_contract, fragment)
 
+        if self.lean:
+            return None
 
         node = Node(ctx=ctx,
                     type='InLineAssemblyStatement',
@@ -680,10 +1172,10 @@ class InlineAssemblyVisitor(SolidityVisitor):
         assert self._current_fragment is not None
         try:
             name = ctx.identifier().getText()
-        except:
+        except (AttributeError, IndexError):
             try:
                 name = ctx.identifier()[0].getText()
-            except:
+            except (AttributeError, IndexError):
                 name = ''
         return Node(ctx=ctx,
                     type='AssemblyMember',
@@ -700,8 +1192,7 @@ class InlineAssemblyVisitor(SolidityVisitor):
                     functionName=functionName,
                     arguments=args)
 
-        self._current_fragment.calls_counter = functionName
-        self._current_fragment.calls = node
+        self._current_fragment.add_call(functionName)
 
         return node
 
@@ -737,7 +1228,7 @@ class InlineAssemblyVisitor(SolidityVisitor):
                     type='AssemblySwitch',
                     expression=self.visit(ctx.assemblyExpression()),
                     cases=[self.visit(c) for c in ctx.assemblyCase()])
-        self._current_fragment.switch_stmts = node
+        self._current_fragment.add('switch_stmts')
         return node
 
     def visitAssemblyCase(self, ctx):
@@ -771,7 +1262,7 @@ class InlineAssemblyVisitor(SolidityVisitor):
                     type='AssemblyLocalDefinition',
                     names=names,
                     expression=expression)
-        self._current_fragment.definitions = node
+        self._current_fragment.add('definitions')
 
         return node
 
@@ -779,11 +1270,11 @@ class InlineAssemblyVisitor(SolidityVisitor):
         assert self._current_fragment is not None
         try:
             args = ctx.assemblyIdentifierList().identifier()
-        except:
+        except (AttributeError, IndexError):
             args = None
         try:
             returnArgs = ctx.assemblyFunctionReturns().assemblyIdentifierList().identifier()
-        except:
+        except (AttributeError, IndexError):
             returnArgs = None
         body = self.visit(ctx.assemblyBlock())
         name = ctx.identifier().getText()
@@ -793,7 +1284,7 @@ class InlineAssemblyVisitor(SolidityVisitor):
                     arguments=self.visit(args),
                     returnArguments=self.visit(returnArgs),
                     body=body)
-        self._current_fragment.functions = node
+        self._current_fragment.add('functions')
         return node
 
     def visitAssemblyAssignment(self, ctx):
@@ -805,7 +1296,9 @@ class InlineAssemblyVisitor(SolidityVisitor):
         else:
             try:
                 names = self.visit(names.assemblyIdentifierList().identifier())
-            except:
+            except BudgetExceeded:
+                raise
+            except Exception:
                 names = []
 
         expression = self.visit(ctx.assemblyExpression())
@@ -815,7 +1308,7 @@ class InlineAssemblyVisitor(SolidityVisitor):
                     names=names,
                     expression=expression)
 
-        self._current_fragment.assignments = node
+        self._current_fragment.add('assignments')
 
         return node
 
@@ -826,7 +1319,7 @@ class InlineAssemblyVisitor(SolidityVisitor):
                     type='LabelDefinition',
                     name=ctx.identifier().getText())
 
-        self._current_fragment.label_definitions = node
+        self._current_fragment.add('label_definitions')
 
         return node
 
@@ -844,7 +1337,7 @@ class InlineAssemblyVisitor(SolidityVisitor):
                     condition=self.visit(ctx.getChild(2)),
                     post=self.visit(ctx.getChild(3)),
                     body=self.visit(ctx.getChild(4)))
-        self._current_fragment.for_stmts = node
+        self._current_fragment.add('for_stmts')
         return node
 
     def visitAssemblyIf(self, ctx):
@@ -853,7 +1346,7 @@ class InlineAssemblyVisitor(SolidityVisitor):
                     type='AssemblyIf',
                     condition=self.visit(ctx.assemblyExpression()),
                     body=self.visit(ctx.assemblyBlock()))
-        self._current_fragment.if_stmts = node
+        self._current_fragment.add('if_stmts')
         return node
 
     # end inline assembly
@@ -1087,7 +1580,9 @@ class InlineAssemblyVisitor(SolidityVisitor):
 
         try:
             TrueBody = self.visit(ctx.statement(0))
-        except:
+        except BudgetExceeded:
+            raise
+        except Exception:
             # There is a parsing error inside the true body
             # (probably a missing ';')
             TrueBody = None
@@ -1161,7 +1656,9 @@ class InlineAssemblyVisitor(SolidityVisitor):
     def visitSimpleStatement(self, ctx):
         try:
             return self.visit(ctx.getChild(0))
-        except:
+        except BudgetExceeded:
+            raise
+        except Exception:
             # There is a but in antlr4/ParserRuleContext.py instead of
             # raising an exception it should return None
             return None
@@ -1508,36 +2005,645 @@ class InlineAssemblyVisitor(SolidityVisitor):
     def visitTerminal(self, ctx):
         return ctx.getText()
 
-def parse(filename, text, start="sourceUnit"):
+def _new_parse_stats():
+    return {'sll': 0, 'll': 0, 'sll_time': 0.0, 'll_time': 0.0}
+
+
+def _parse_tree(token_stream, start, stats, two_stage=True):
+    """
+    Run the start rule of SolidityParser on token_stream.
+
+    With two_stage, it first tries the faster SLL prediction mode with a
+    bail-out error strategy, and it re-parses with full LL prediction (and
+    the default error recovery) only if SLL fails. stats counts how many
+    parses succeeded in each stage and accumulates the time of each stage.
+    """
+    if two_stage:
+        parser = SolidityParser(token_stream)
+        parser._interp.predictionMode = PredictionMode.SLL
+        parser._errHandler = BailErrorStrategy()
+        parser.removeErrorListeners()
+        started = time.perf_counter()
+        try:
+            tree = getattr(parser, start)()
+            stats['sll'] += 1
+            return tree
+        except ParseCancellationException:
+            token_stream.seek(0)
+        finally:
+            stats['sll_time'] += time.perf_counter() - started
+
+    parser = SolidityParser(token_stream)
+    started = time.perf_counter()
+    tree = getattr(parser, start)()
+    stats['ll_time'] += time.perf_counter() - started
+    stats['ll'] += 1
+    return tree
+
+
+def _count_nodes(tree):
+    """Return the number of nodes (rules and tokens) of a parse tree."""
+    n = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        n += 1
+        children = getattr(node, 'children', None)
+        if children:
+            stack.extend(children)
+    return n
+
+
+def parse(filename, text, start="sourceUnit", two_stage=True, lean=False,
+          memo=None, profile=False):
+    """
+    With profile, the tokens are lexed before parsing, so that the time of
+    each phase is recorded in the profile of the results.
+    """
+    started = time.perf_counter()
     input_stream = InputStream(text)
 
     lexer = SolidityLexer(input_stream)
     token_stream = CommonTokenStream(lexer)
-    parser = SolidityParser(token_stream)
-    inline_visitor = InlineAssemblyVisitor(filename)
+    if profile:
+        token_stream.fill()
+        lexed = time.perf_counter()
+    inline_visitor = InlineAssemblyVisitor(filename, lean=lean, memo=memo)
+    stats = inline_visitor.data.parse_stats = _new_parse_stats()
+
+    tree = _parse_tree(token_stream, start, stats, two_stage)
+    parsed = time.perf_counter()
+    inline_visitor.visit(tree)
+
+    if profile:
+        inline_visitor.data.profile = dict(
+            new_profile(), lex=lexed - started, parse=parsed - lexed,
+            visit=time.perf_counter() - parsed,
+            tokens=len(token_stream.tokens), nodes=_count_nodes(tree))
+    return inline_visitor.data
+
+
+##### Fragment-only parsing #####
+
+CONTRACT_KEYWORDS = ('contract', 'interface', 'library')
+FUNCTION_KEYWORDS = ('function', 'modifier', 'constructor', 'fallback',
+                     'receive')
+
+
+def _match_braces(tokens):
+    """Map the index of every '{' token to the index of its closing '}'."""
+    matches = {}
+    stack = []
+    for i, tok in enumerate(tokens):
+        if tok.text == '{':
+            stack.append(i)
+        elif tok.text == '}' and stack:
+            matches[stack.pop()] = i
+    # Unbalanced braces (i.e., truncated sources) close at the last token.
+    for i in stack:
+        matches[i] = len(tokens) - 1
+    return matches
+
+
+def _find_body(tokens, i):
+    """
+    Starting from tokens[i], return the index of the first '{' or ';'
+    that is not enclosed in parentheses.
+    """
+    parens = 0
+    for j in range(i, len(tokens)):
+        text = tokens[j].text
+        if text == '(':
+            parens += 1
+        elif text == ')':
+            parens -= 1
+        elif parens == 0 and text in ('{', ';'):
+            return j
+    return len(tokens) - 1
+
+
+def _is_function_definition(tokens, i, body):
+    """
+    Decide whether the member that starts at tokens[i] and ends at
+    tokens[body] is a function/modifier definition or, e.g., a state variable
+    of function type (function (uint) internal returns (uint) f;).
+    """
+    keyword = tokens[i].text
+    if keyword not in FUNCTION_KEYWORDS:
+        return False
+    if i + 1 >= len(tokens):
+        return False
+    if keyword != 'function':
+        return keyword == 'modifier' or tokens[i + 1].text == '('
+    if tokens[i + 1].text != '(':
+        # function name(...)
+        return True
+    if tokens[body].text == '{':
+        # function () { ... } (old-style fallback)
+        return True
+    parens = 0
+    for tok in tokens[i:body]:
+        if tok.text == '(':
+            parens += 1
+        elif tok.text == ')':
+            parens -= 1
+        elif parens == 0 and tok.text == '=':
+            return False
+    return not is_plain_identifier(tokens[body - 1].text)
+
+
+def _scan_tokens(tokens, eof, text, data):
+    """
+    Perform a cheap token-level scan of a source unit.
 
-    inline_visitor.visit(getattr(parser, start)())
+    It populates data with the contracts, the number of their
+    functions/modifiers, and the Solidity version, and it returns the
+    inline assembly regions as (contract, first token, last token) tuples.
+    """
+    first, last = (tokens[0], tokens[-1]) if tokens else (eof, eof)
+    data.code = text[first.start:last.stop + 1]
+    data.total_lines.append(_get_tokens_loc(first, last))
+
+    braces = _match_braces(tokens)
+    regions = []
+    contract = None
+    contract_end = -1
+    function = None
+    function_end = -1
+    depth = 0
+    prev = None
+    i = 0
+    while i < len(tokens):
+        tok = tokens[i]
+        if function is not None and i > function_end:
+            function[0].functions += 1
+            if function[1]:
+                function[0].functions_with_inline_assembly += 1
+            function = None
+        if contract is not None and i > contract_end:
+            contract = None
+
+        if tok.text == '{':
+            depth += 1
+        elif tok.text == '}':
+            depth -= 1
+        elif tok.text == 'assembly' and depth > 0:
+            j = _find_body(tokens, i)
+            last = braces.get(j, j)
+            owner = contract or (data.contracts[-1] if data.contracts else None)
+            if owner is not None:
+                regions.append((owner, i, last))
+                if function is not None:
+                    function[1] = True
+            prev = tokens[last].text
+            i = last + 1
+            continue
+        elif prev in (None, '{', '}', ';') and \
+                (depth == 0 or (contract is not None and depth == 1)):
+            if depth == 0 and tok.text == 'pragma':
+                j = _find_body(tokens, i)
+                if i + 1 < j and tokens[i + 1].text == 'solidity':
+                    data.solidity_version = ''.join(
+                        t.text for t in tokens[i + 2:j])
+            elif depth == 0 and (tok.text in CONTRACT_KEYWORDS or (
+                    tok.text == 'abstract' and i + 1 < len(tokens) and
+                    tokens[i + 1].text in CONTRACT_KEYWORDS)):
+                k = i + 1 if tok.text == 'abstract' else i
+                j = _find_body(tokens, i)
+                contract_end = braces.get(j, j)
+                contract = Contract(tokens[k + 1].text
+                                    if k + 1 < len(tokens) else '')
+                contract.lines = _get_tokens_loc(tok, tokens[contract_end])
+                contract.code = text[tok.start:tokens[contract_end].stop + 1]
+                data.contracts.append(contract)
+            else:
+                j = _find_body(tokens, i)
+                if _is_function_definition(tokens, i, j):
+                    owner = contract or (data.contracts[-1]
+                                         if data.contracts else None)
+                    if owner is not None:
+                        function = [owner, False]
+                        function_end = braces.get(j, j)
+        prev = tok.text
+        i += 1
+    if function is not None:
+        function[0].functions += 1
+        if function[1]:
+            function[0].functions_with_inline_assembly += 1
+    return regions
+
+
+def _get_memo_fragment(memo, tokens, first, last, text):
+    """
+    Return a new fragment for tokens[first:last + 1] with the counters of
+    memo, or None and the key of the fragment if it is not in memo.
+    """
+    key = memo.key([t.text for t in tokens[first:last + 1]])
+    counters = memo.get(key)
+    if counters is None:
+        return None, key
+    start, stop = tokens[first], tokens[last]
+    fragment = InlineAssemblyFragment(
+        loc=_get_tokens_loc(start, stop),
+        span=(text, start.start, stop.stop))
+    fragment.counters = counters[:]
+    return fragment, key
+
+
+def parse_fragments(filename, text, two_stage=True, memo=None,
+                    profile=False):
+    """
+    Lex the whole file once, but parse only its inline assembly
+    statements. Contracts and functions are counted by a token-level scan.
+    """
+    started = time.perf_counter()
+    input_stream = InputStream(text)
 
+    lexer = SolidityLexer(input_stream)
+    token_stream = CommonTokenStream(lexer)
+    token_stream.fill()
+    tokens = [t for t in token_stream.tokens
+              if t.channel == Token.DEFAULT_CHANNEL]
+    eof = tokens.pop()
+    lexed = time.perf_counter()
+    inline_visitor = InlineAssemblyVisitor(filename)
+    stats = inline_visitor.data.parse_stats = _new_parse_stats()
+    visit_time = 0.0
+    nodes = 0
+
+    for contract, first, last in _scan_tokens(tokens, eof, text,
+                                              inline_visitor.data):
+        if memo is not None:
+            fragment, key = _get_memo_fragment(memo, tokens, first, last,
+                                               text)
+            if fragment is not None:
+                inline_visitor.data.add_fragment(contract, fragment)
+                continue
+        region = CommonTokenStream(ListTokenSource(tokens[first:last + 1]))
+        inline_visitor._current_contract = contract
+        tree = _parse_tree(region, "inlineAssemblyStatement", stats,
+                           two_stage)
+        visit_started = time.perf_counter()
+        inline_visitor.visit(tree)
+        visit_time += time.perf_counter() - visit_started
+        if profile:
+            nodes += _count_nodes(tree)
+        if memo is not None:
+            memo.put(key, contract.fragments[-1].counters[:])
+
+    if profile:
+        # The token-level scan is part of parsing
+        inline_visitor.data.profile = dict(
+            new_profile(), lex=lexed - started,
+            parse=time.perf_counter() - lexed - visit_time, visit=visit_time,
+            tokens=len(token_stream.tokens), nodes=nodes)
     return inline_visitor.data
 
 
-def parse_file(path, start="sourceUnit"):
-    with open(path, 'r', encoding="utf-8") as f:
-        return parse(path, f.read(), start=start)
+def parse_fast(filename, text, memo=None, profile=False):
+    """
+    Parse a file without ANTLR, using library.tokenizer for the token-level
+    scan and library.yul for the inline assembly fragments.
+    """
+    started = time.perf_counter()
+    tokens = tokenize(text)
+    eof = tokens.pop()
+    lexed = time.perf_counter()
+    data = FileInlineAssemblyData(filename)
+
+    for contract, first, last in _scan_tokens(tokens, eof, text, data):
+        if memo is not None:
+            fragment, key = _get_memo_fragment(memo, tokens, first, last,
+                                               text)
+            if fragment is not None:
+                data.add_fragment(contract, fragment)
+                continue
+        start, stop = tokens[first], tokens[last]
+        fragment = InlineAssemblyFragment(
+            loc=_get_tokens_loc(start, stop),
+            span=(text, start.start, stop.stop))
+        parse_assembly(tokens, first, last, fragment)
+        data.add_fragment(contract, fragment)
+        if memo is not None:
+            memo.put(key, fragment.counters[:])
+
+    if profile:
+        # There is no parse tree, the fragments are counted while parsing
+        data.profile = dict(new_profile(), lex=lexed - started,
+                            parse=time.perf_counter() - lexed,
+                            tokens=len(tokens) + 1)
+    return data
+
+
+##### Parser backends #####
+
+class ParserBackend:
+    """
+    A backend turns the source code of a Solidity file into
+    FileInlineAssemblyData.
+    """
+    name = None
+    # A FragmentMemo shared by all the files parsed with the backend
+    memo = None
+    # Record the profile of each file (see library.profiler)
+    profile = False
+
+    def parse(self, filename, text):
+        raise NotImplementedError
+
+    def options(self):
+        """The options that affect the results (part of the cache key)."""
+        return (self.name,)
+
+
+class AntlrBackend(ParserBackend):
+    """The ANTLR grammar of solidity-parser (reference implementation)."""
+    name = 'antlr'
+
+    def __init__(self, start="sourceUnit", fragments=False, two_stage=True,
+                 lean=False, memo=None, profile=False):
+        self.start = start
+        self.fragments = fragments
+        self.two_stage = two_stage
+        self.lean = lean
+        self.memo = memo
+        self.profile = profile
+
+    def parse(self, filename, text):
+        if self.fragments:
+            return parse_fragments(filename, text, two_stage=self.two_stage,
+                                   memo=self.memo, profile=self.profile)
+        return parse(filename, text, start=self.start,
+                     two_stage=self.two_stage, lean=self.lean,
+                     memo=self.memo, profile=self.profile)
+
+    def options(self):
+        return (self.name, self.start, self.fragments)
+
+
+class FastBackend(ParserBackend):
+    """
+    A pure-Python tokenizer and Yul parser. It should produce the same
+    results as AntlrBackend for any source that the grammar accepts.
+    """
+    name = 'fast'
+
+    def __init__(self, memo=None, profile=False):
+        self.memo = memo
+        self.profile = profile
 
+    def parse(self, filename, text):
+        return parse_fast(filename, text, memo=self.memo,
+                          profile=self.profile)
 
-def parse_input(path):
+
+BACKENDS = {backend.name: backend for backend in (AntlrBackend, FastBackend)}
+
+
+def read_source(path):
+    """
+    Return the contents of file path and its text, i.e., decoded as
+    open(path, 'r', encoding="utf-8") would.
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    text = raw.decode('utf-8')
+    if '\r' in text:
+        # Universal newlines
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return raw, text
+
+
+def parse_file(path, backend=None, cache=None):
+    """
+    Parse a file with backend. If a ParseCache is given, the results of a
+    file with the same source code are reused, and new results are stored.
+    """
+    profile = backend is not None and backend.profile
+    if profile:
+        reset_peak_rss()
+        started = time.perf_counter()
+    raw, text = read_source(path)
+    if not profile:
+        return parse_source(path, text, backend, cache, raw)
+    read = time.perf_counter() - started
+    data = parse_source(path, text, backend, cache, raw)
+    if data.profile is None:
+        data.profile = dict(new_profile(), cached=True)
+    data.profile['read'] = read
+    data.profile['peak_rss'] = get_peak_rss()
+    return data
+
+
+def parse_source(name, text, backend=None, cache=None, raw=None):
+    """
+    Like parse_file, for the source code text of file name. raw is the
+    contents of the file, for the byte offsets of the fragments (see
+    FileInlineAssemblyData.set_byte_offsets).
+    """
+    backend = backend or AntlrBackend()
+    key = None
+    if cache is not None:
+        # The byte offsets depend on the contents of the file
+        key = cache.key(text if raw is None else raw, PARSER_VERSION,
+                        *backend.options())
+        data = get_cached(cache, key, name)
+        if data is not None:
+            if raw is None:
+                # There may be no file name (e.g., the source of a --serve
+                # request) to read the code of the fragments back from
+                data.set_fragment_code(text)
+            return data
+    data = backend.parse(name, text)
+    data.set_byte_offsets(text, raw)
+    if cache is not None:
+        cache.put(key, data)
+    return data
+
+
+def get_cached(cache, key, path):
+    """Return the cached results of key for file path, or None."""
+    data = cache.get(key)
+    if data is not None:
+        data.name = path
+        # Nothing has been parsed
+        data.parse_stats = None
+        data.profile = None
+    return data
+
+
+def parse_file_within(path, budget, backend=None, cache=None):
+    """
+    Like parse_file, but raise BudgetExceeded (with the file set) if the
+    Budget budget is exceeded. Without a budget, it is parse_file.
+    """
+    if budget is None:
+        return parse_file(path, backend, cache)
+    try:
+        with budget:
+            return parse_file(path, backend, cache)
+    except BudgetExceeded as e:
+        e.file = path
+        raise
+
+
+def parse_source_within(name, text, budget, backend=None, cache=None,
+                        raw=None):
+    """Like parse_file_within, for the source code text of file name."""
+    if budget is None:
+        return parse_source(name, text, backend, cache, raw)
+    try:
+        with budget:
+            return parse_source(name, text, backend, cache, raw)
+    except BudgetExceeded as e:
+        e.file = name
+        raise
+
+
+def get_input_files(path):
+    """
+    Return path if it is a file, the .sol files of directory path, or path
+    itself if it is a list of files.
+    """
+    if isinstance(path, list):
+        return path
     if os.path.isfile(path):
-        return InlineAssemblyData([parse_file(path)])
+        return [path]
     elif os.path.isdir(path):
-        files = [os.path.join(path, f) for f in os.listdir(path)
-                 if os.path.isfile(os.path.join(path, f)) and '.sol' in f]
-        results = [parse_file(f) for f in files]
-        return InlineAssemblyData(results)
+        return [os.path.join(path, f) for f in os.listdir(path)
+                if os.path.isfile(os.path.join(path, f)) and '.sol' in f]
     else:
         raise FileNotFoundError(f"{path} does not exists")
 
 
+def parse_input(path, backend=None, include_code=False, cache=None):
+    """
+    Parse a file or all the .sol files of a directory. Without a backend,
+    it uses AntlrBackend, in lean mode unless include_code is set.
+    """
+    return InlineAssemblyData(
+        list(iter_parse_input(path, backend, include_code, cache)))
+
+
+# The backend of a worker process of iter_parse_input
+_worker_backend = None
+_worker_include_code = False
+_worker_budget = None
+
+
+def _init_worker(backend, include_code, budget):
+    global _worker_backend, _worker_include_code, _worker_budget
+    _worker_backend = backend
+    _worker_include_code = include_code
+    _worker_budget = budget
+
+
+def _parse_worker(path):
+    try:
+        data = parse_file_within(path, _worker_budget, _worker_backend)
+    except BudgetExceeded as e:
+        return e
+    if not _worker_include_code:
+        # Do not send back the source code of the whole file
+        data.discard_code()
+    return data
+
+
+def iter_parse_input(path, backend=None, include_code=False, cache=None,
+                     jobs=1, budget=None, quarantine=None):
+    """
+    Like parse_input, but yield the FileInlineAssemblyData of each file as
+    soon as it is parsed. With jobs > 1, files are parsed in a pool of jobs
+    processes, and they are yielded in the order they are finished. The
+    ParseCache is only used by the calling process, and with it, only one
+    of the files with the same source code is parsed; the results of the
+    others are read from the cache.
+
+    With a Budget, the files that exceed it are not yielded, but added to
+    quarantine (a library.budget.Quarantine).
+    """
+    backend = backend or AntlrBackend(lean=not include_code)
+    quarantine = quarantine or Quarantine()
+    files = get_input_files(path)
+    if jobs <= 1 or len(files) <= 1:
+        for f in files:
+            try:
+                yield parse_file_within(f, budget, backend, cache)
+            except BudgetExceeded as e:
+                quarantine.add(e)
+        return
+
+    def get_cached_file(key, f):
+        data = get_cached(cache, key, f)
+        if data is not None and backend.profile:
+            data.profile = dict(new_profile(), cached=True)
+        return data
+
+    keys = {}
+    # key -> the other files with the source code of the parsed file of key
+    duplicates = {}
+    if cache is not None:
+        pending = []
+        for f in files:
+            key = cache.key(read_source(f)[0], PARSER_VERSION,
+                            *backend.options())
+            if key in duplicates:
+                duplicates[key].append(f)
+                continue
+            data = get_cached_file(key, f)
+            if data is None:
+                keys[f] = key
+                duplicates[key] = []
+                pending.append(f)
+            else:
+                yield data
+        files = pending
+
+    # The largest files first, one at a time (chunks would give the largest
+    # files to the same process), so that the pool does not wait for a large
+    # file that started last
+    files = order_largest_first(files)
+    # Cached results must keep their code
+    keep_code = include_code or cache is not None
+    with multiprocessing.Pool(jobs, initializer=_init_worker,
+                              initargs=(backend, keep_code, budget)) as pool:
+        for data in pool.imap_unordered(_parse_worker, files):
+            if isinstance(data, BudgetExceeded):
+                quarantine.add(data)
+                for f in duplicates.get(keys.get(data.file), ()):
+                    e = BudgetExceeded(data.reason, data.cpu_time, data.rss)
+                    e.file = f
+                    quarantine.add(e)
+                continue
+            if cache is not None:
+                key = keys[data.name]
+                cache.put(key, data)
+                yield data
+                for f in duplicates[key]:
+                    yield get_cached_file(key, f)
+                continue
+            yield data
+
+
+def warm_up(paths, backend):
+    """
+    Parse the files of paths (files or directories) with an AntlrBackend
+    like backend, and discard the results. It fills the DFA caches of the
+    lexer and the parser, which are shared by the later parses of the
+    process, and by the worker processes that it forks (copy-on-write).
+    Return the number of parsed files.
+    """
+    # Neither the memo nor the code are needed
+    backend = AntlrBackend(start=backend.start, fragments=backend.fragments,
+                           two_stage=backend.two_stage, lean=True)
+    n = 0
+    for path in paths:
+        for f in get_input_files(path):
+            parse_file(f, backend)
+            n += 1
+    return n
+
+
 def get_top(opcodes):
     sorted_opcodes = list(sorted(opcodes.items(),
                                  key=lambda item: item[1],
@@ -1547,6 +2653,12 @@ def get_top(opcodes):
     return opcodes
 
 def print_statistics(data):
+    """
+    Print the statistics of InlineAssemblyData or InlineAssemblyStatistics
+    data.
+    """
+    if isinstance(data, InlineAssemblyData):
+        data = data.get_statistics()
     contracts = data.compute('get_total_contracts', 'sum')
     print(f"Number of contracts: {contracts}")
     functions = data.compute('get_total_functions', 'sum')
@@ -1578,12 +2690,33 @@ def print_statistics(data):
     if declarations:
         print(f"Top DECLARATIONS: {declarations}")
 
+    parse_stats = data.compute('get_parse_stats', 'dict')
+    if parse_stats:
+        print()
+        print("Parses succeeded with SLL: {} (time: {:.2f}s)".format(
+            parse_stats['sll'], parse_stats['sll_time']))
+        print("Parses fell back to LL: {} (time: {:.2f}s)".format(
+            parse_stats['ll'], parse_stats['ll_time']))
 
-def get_args():
+
+def print_histograms(stats):
+    """Print the per-address histograms of InlineAssemblyStatistics."""
+    histograms = stats.get_histograms()
+    print(f"Number of addresses: {stats.addresses}")
+    for name, bucketed in stats.HISTOGRAMS.items():
+        values = ", ".join(
+            "{}{} ({})".format(k, f"-{2 * k - 1}" if bucketed and k > 1 else "",
+                               count)
+            for k, count in sorted(histograms[name].items()))
+        print(f"{name.replace('_', ' ').capitalize()} per address: {values}")
+
+
+def get_parser():
     parser = argparse.ArgumentParser(
         description='Process inline assembly of a solidity file')
     parser.add_argument(
-        "file", help="Path of the solidity file or directory with solidity files"
+        "file", nargs='?',
+        help="Path of the solidity file or directory with solidity files"
     )
     parser.add_argument(
         "-p", "--print",
@@ -1599,18 +2732,413 @@ def get_args():
         action="store_true",
         help="Save Code"
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--fragment-code",
+        action="store_true",
+        help="Save the code of the inline assembly fragments (implied by "
+             "-c). Otherwise, it can be read from the files by the "
+             "original_bytes of the fragments (see library/sources.py)"
+    )
+    parser.add_argument(
+        "-f", "--fragments",
+        action="store_true",
+        help="Parse only the inline assembly fragments (faster, "
+             "contracts and functions are detected by a token-level scan)"
+    )
+    parser.add_argument(
+        "-b", "--backend",
+        choices=sorted(BACKENDS),
+        default=AntlrBackend.name,
+        help="Parser backend (default: antlr). The fast backend does not "
+             "use ANTLR at all"
+    )
+    parser.add_argument(
+        "--ll",
+        action="store_true",
+        help="Always use full LL prediction (antlr backend), instead of "
+             "trying the faster SLL prediction first"
+    )
+    parser.add_argument(
+        "--cache",
+        help="Path of an sqlite3 parse cache. The results of files with the "
+             "same source code are reused"
+    )
+    parser.add_argument(
+        "--fragment-memo",
+        help="Load and save the memo of the inline assembly fragments "
+             "(the results of fragments with the same tokens are reused) "
+             "from/to this file"
+    )
+    parser.add_argument(
+        "--no-memo",
+        action="store_true",
+        help="Do not reuse the results of identical fragments"
+    )
+    parser.add_argument(
+        "--jsonl",
+        action="store_true",
+        help="Save the results as JSON lines, i.e., one record per file "
+             "(the path of --save must end with .jsonl)"
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes that parse the files of a directory "
+             "(default: 1). Each process has its own fragment memo, which "
+             "is not saved"
+    )
+    parser.add_argument(
+        "--warmup",
+        action="append",
+        default=[],
+        metavar="PATH",
+        help="Parse this file or directory first, and discard its results, "
+             "to warm up the DFA caches of the antlr backend before parsing "
+             "file or forking the --jobs processes (can be repeated)"
+    )
+    parser.add_argument(
+        "--dfa-cache",
+        help="Load the DFA caches of the antlr backend from this file at "
+             "startup (if it exists), and save them to it at the end"
+    )
+    parser.add_argument(
+        "--max-cpu",
+        type=float,
+        help="CPU time limit of a single file, in seconds. Files over it "
+             "are skipped and quarantined"
+    )
+    parser.add_argument(
+        "--max-rss",
+        type=int,
+        help="Limit of the growth of the resident memory of the process "
+             "while parsing a single file, in MiB. Files over it are skipped "
+             "and quarantined"
+    )
+    parser.add_argument(
+        "--quarantine",
+        help="Append the files over --max-cpu or --max-rss, and the reason, "
+             "to this JSON lines manifest"
+    )
+    parser.add_argument(
+        "--retry-quarantine",
+        action="store_true",
+        help="file is a quarantine manifest: parse its files again (e.g., "
+             "with -f and larger limits)"
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="CSV",
+        help="Append the profile of each file (time of each phase, tokens, "
+             "parse tree nodes, peak RSS) to this CSV file, and print a "
+             "summary"
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        metavar="N",
+        help="Number of slowest files in the profile summary (default: 10)"
+    )
+    parser.add_argument(
+        "--profile-summary",
+        metavar="CSV",
+        help="Only print the summary of a --profile CSV file"
+    )
+    parser.add_argument(
+        "--save-stats",
+        metavar="JSONL",
+        help="Append the statistics of the run (see -p), which can be merged "
+             "with the statistics of other runs, to a JSON lines file"
+    )
+    parser.add_argument(
+        "--merge-stats",
+        nargs="+",
+        metavar="JSONL",
+        help="Only merge and print the statistics of --save-stats files "
+             "(and save them with --save-stats)"
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run as a worker: read JSON lines requests from stdin (or "
+             "--socket) and write JSON lines responses, instead of parsing "
+             "file (see library/workers.py)"
+    )
+    parser.add_argument(
+        "--socket",
+        help="Path of a Unix socket to listen to (with --serve)"
+    )
+    return parser
+
+
+def get_args():
+    parser = get_parser()
+    args = parser.parse_args()
+    if args.jsonl and not (args.save and is_jsonl(args.save)):
+        parser.error("--jsonl requires a --save path that ends with .jsonl")
+    if args.file is None and not (args.serve or args.profile_summary
+                                  or args.merge_stats):
+        parser.error("the following arguments are required: file")
+    return args
+
+
+def get_memo(args):
+    if args.no_memo:
+        return None
+    return FragmentMemo(path=args.fragment_memo,
+                        namespace=f"{PARSER_VERSION}:{args.backend}")
+
+
+def get_budget(args):
+    if args.max_cpu is None and args.max_rss is None:
+        return None
+    rss = args.max_rss * 2**20 if args.max_rss is not None else None
+    return Budget(cpu_time=args.max_cpu, rss=rss)
+
+
+def get_backend(args, memo=None):
+    profile = args.profile is not None
+    if args.backend == FastBackend.name:
+        return FastBackend(memo=memo, profile=profile)
+    return AntlrBackend(fragments=args.fragments, two_stage=not args.ll,
+                        lean=not args.code, memo=memo, profile=profile)
+
+
+# The number of DFA states loaded from --dfa-cache
+_loaded_dfa_states = None
+
+
+def prepare_backend(args, backend):
+    """
+    Load the --dfa-cache and parse the --warmup files (antlr backend).
+    Return a message about it, or None.
+    """
+    if not isinstance(backend, AntlrBackend):
+        return None
+    global _loaded_dfa_states
+    messages = []
+    if args.dfa_cache and load_dfa(args.dfa_cache):
+        _loaded_dfa_states = count_dfa_states()
+        messages.append(f"loaded {args.dfa_cache}")
+    if args.warmup:
+        start = time.perf_counter()
+        n = warm_up(args.warmup, backend)
+        messages.append(
+            f"parsed {n} files in {time.perf_counter() - start:.2f}s")
+    if not messages:
+        return None
+    return f"DFA cache: {', '.join(messages)} ({count_dfa_states()} states)"
+
+
+def save_dfa_cache(args, backend):
+    """Save the --dfa-cache, unless no DFA state was added to it."""
+    if args.dfa_cache and isinstance(backend, AntlrBackend) and \
+            count_dfa_states() != _loaded_dfa_states:
+        save_dfa(args.dfa_cache)
+
+
+def iter_json_results(files, include_code=False, fragment_code=None,
+                      profiler=None):
+    """
+    Yield the (name, JSON results) pairs of files. With a Profiler, the
+    time of to_json_results and the time until the next pair is requested
+    (i.e., the serialization of the pair) are added to the profiles.
+    """
+    for data in files:
+        started = time.perf_counter()
+        res = data.to_json_results(include_code, fragment_code)
+        aggregated = time.perf_counter()
+        yield data.name, res
+        if profiler is not None:
+            profile = data.profile or new_profile()
+            profile['aggregate'] = aggregated - started
+            profile['serialize'] = time.perf_counter() - aggregated
+            profiler.add(data.name, profile)
+
+
+def save_results(results, path, jsonl=False):
+    """
+    Save the (name, JSON results) pairs of results to path as one JSON
+    object or, with jsonl, as JSON lines (see library.results).
+    """
+    write = write_results_jsonl if jsonl else write_results
+    # Write to a temporary file, so that path is either complete or missing
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        write(results, f)
+    os.replace(tmp, path)
+
+
+##### Worker service #####
+
+def handle_request(request, backend, cache=None, budget=None,
+                   quarantine=None):
+    """
+    Parse the file of a request and return the response.
+
+    A request is a dict with either the "path" of a file or the "source"
+    code of a file (and optionally its "name"), an optional "id" that is
+    copied to the response, and optional "code" and "fragment_code" flags
+    (see --code and --fragment-code). The response contains the "file" and
+    its "results" (as in --save), or an "error". The files over the budget
+    are added to quarantine.
+    """
+    response = {'id': request.get('id')}
+    try:
+        if 'source' in request:
+            data = parse_source_within(request.get('name', '<source>'),
+                                       request['source'], budget, backend,
+                                       cache)
+        else:
+            data = parse_file_within(request['path'], budget, backend, cache)
+        response['file'] = data.name
+        response['results'] = data.to_json_results(
+            request.get('code', False), request.get('fragment_code'))
+    except BudgetExceeded as e:
+        if quarantine is not None:
+            quarantine.add(e)
+        response['error'] = f"{type(e).__name__}: {e}"
+    except Exception as e:
+        response['error'] = f"{type(e).__name__}: {e}"
+    return response
+
+
+def serve(backend, infile, outfile, cache=None, budget=None, quarantine=None):
+    """
+    Answer the JSON lines requests of infile (see handle_request) with JSON
+    lines responses to outfile, until the end of infile. The lexer, the
+    parser and their caches stay warm across requests.
+    """
+    for line in infile:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            response = {'id': None, 'error': f"invalid request: {e}"}
+        else:
+            response = handle_request(request, backend, cache, budget,
+                                      quarantine)
+        outfile.write(json.dumps(response) + '\n')
+        outfile.flush()
+
+
+def serve_socket(path, backend, cache=None, budget=None, quarantine=None):
+    """Like serve, for the connections to the Unix socket path."""
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            infile = io.TextIOWrapper(self.rfile, encoding='utf-8')
+            outfile = io.TextIOWrapper(self.wfile, encoding='utf-8',
+                                       write_through=True)
+            serve(backend, infile, outfile, cache, budget, quarantine)
+
+    if os.path.exists(path):
+        os.remove(path)
+    with socketserver.UnixStreamServer(path, RequestHandler) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(path)
+
+
+def _add_statistics(files, stats):
+    for data in files:
+        stats.add(data)
+        yield data
+
+
+def main_serve(args):
+    # Clean up (e.g., save the memo) when the worker is terminated
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    memo = get_memo(args)
+    backend = get_backend(args, memo)
+    message = prepare_backend(args, backend)
+    if message:
+        # stdout is for the responses
+        print(message, file=sys.stderr)
+    cache = ParseCache(args.cache) if args.cache else None
+    budget = get_budget(args)
+    quarantine = Quarantine(args.quarantine)
+    try:
+        if args.socket:
+            serve_socket(args.socket, backend, cache, budget, quarantine)
+        else:
+            serve(backend, sys.stdin, sys.stdout, cache, budget, quarantine)
+    finally:
+        if cache is not None:
+            cache.close()
+        if memo is not None:
+            memo.save()
+        save_dfa_cache(args, backend)
 
 
 def main():
     args = get_args()
+    if args.serve:
+        main_serve(args)
+        return
+    if args.profile_summary:
+        summarize_profile(args.profile_summary, args.profile_top).print()
+        return
+    if args.merge_stats:
+        stats = load_statistics(args.merge_stats)
+        print_statistics(stats)
+        print()
+        print_histograms(stats)
+        if args.save_stats:
+            stats.save(args.save_stats)
+        return
     print(f"Processing file: {args.file}")
-    data = parse_input(args.file)
+    memo = get_memo(args)
+    backend = get_backend(args, memo)
+    message = prepare_backend(args, backend)
+    if message:
+        print(message)
+    cache = ParseCache(args.cache) if args.cache else None
+    quarantine = Quarantine(args.quarantine)
+    path = args.file
+    if args.retry_quarantine:
+        path = get_quarantined_files(args.file)
+    profiler = Profiler(args.profile, args.profile_top) \
+        if args.profile else None
+    stats = InlineAssemblyStatistics()
+    try:
+        results = _add_statistics(
+            iter_parse_input(path, backend, args.code, cache, args.jobs,
+                             get_budget(args), quarantine),
+            stats)
+        if args.save or profiler is not None:
+            results = iter_json_results(results, args.code,
+                                        args.code or args.fragment_code,
+                                        profiler)
+        if args.save:
+            save_results(results, args.save, args.jsonl)
+        else:
+            for _ in results:
+                pass
+    finally:
+        if cache is not None:
+            cache.close()
+    if cache is not None:
+        print(f"Parse cache: {cache.hits} hits, {cache.misses} misses")
+    if quarantine.files:
+        print(f"Quarantined files: {quarantine.files}")
+    if memo is not None:
+        memo.save()
+    save_dfa_cache(args, backend)
+    if args.save_stats:
+        stats.save(args.save_stats)
     if args.print:
-        print_statistics(data)
-    if args.save:
-        with open(args.save, 'w') as f:
-            json.dump(data.to_json_results(args.code), f)
+        print_statistics(stats)
+        if memo is not None and args.jobs <= 1:
+            print(f"Fragment memo: {memo.hits} hits, {memo.misses} misses")
+    if profiler is not None:
+        print()
+        profiler.summary.print()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,345 @@
+"""
+Benchmark the parser on synthetic corpora (see library/synthetic.py).
+
+Every configuration is a base corpus with one parameter (axis) changed, and
+for each one the following are timed: parse (the backend on the source code
+of every file), parse_input (reading and parsing the corpus directory),
+InlineAssemblyData.compute (all the statistics of print_statistics, one
+at a time), InlineAssemblyStatistics (all of them in a single pass), and
+InlineAssemblyData.to_json_results. The results are saved as JSON together
+with the commit and the options, so that the runs of two commits can be
+compared with --compare, which requires the same options (see
+COMPARED_OPTIONS).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from analyze_contracts import BACKENDS, PARSER_VERSION, AntlrBackend, \
+    FastBackend, InlineAssemblyStatistics, parse_input
+from library.cache import ParseCache, FragmentMemo
+from library.synthetic import DEFAULTS, generate_corpus, parse_mix
+
+
+MEASUREMENTS = ('parse', 'parse_input', 'compute', 'statistics',
+                'to_json_results')
+
+# The options that change what is timed, which must be the same for the
+# results of two runs to be compared
+COMPARED_OPTIONS = ('backend', 'fragments', 'll', 'lean', 'memo', 'cache')
+# The options of the antlr backend only (None with the fast backend)
+ANTLR_OPTIONS = ('fragments', 'll', 'lean')
+
+# The axes varied by default, one at a time
+DEFAULT_AXES = {
+    'files': [2, 32],
+    'contracts': [1, 8],
+    'density': [0.1, 1.0],
+    'statements': [2, 40],
+    'mix': ['let', 'switch', 'for', 'function'],
+    'duplicates': [0.5, 0.9],
+}
+
+
+def _parse_value(axis, value):
+    if axis not in DEFAULTS:
+        raise argparse.ArgumentTypeError(
+            f"unknown axis {axis!r} (one of {', '.join(DEFAULTS)})")
+    if axis == 'mix':
+        parse_mix(value)
+        return value
+    return type(DEFAULTS[axis])(value)
+
+
+def axis_values(text):
+    """Parse AXIS=V1,V2,..."""
+    axis, _, values = text.partition('=')
+    if not values:
+        raise argparse.ArgumentTypeError(f"expected AXIS=VALUE, got {text!r}")
+    if axis == 'mix' and '=' in values:
+        # A single custom mix, e.g., mix=let=2,for=1
+        return axis, [_parse_value(axis, values)]
+    return axis, [_parse_value(axis, v) for v in values.split(',')]
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the parser on synthetic Solidity corpora.')
+    parser.add_argument(
+        "-o", "--output",
+        help="Save the results to this JSON file"
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="JSON",
+        help="Compare the results with the results of an earlier run"
+    )
+    parser.add_argument(
+        "-r", "--repeat",
+        type=int,
+        default=3,
+        help="Number of timed runs of each configuration (default: 3)"
+    )
+    parser.add_argument(
+        "-b", "--backend",
+        choices=sorted(BACKENDS),
+        default=AntlrBackend.name,
+        help="Parser backend (default: antlr)"
+    )
+    parser.add_argument(
+        "-f", "--fragments",
+        action="store_true",
+        help="Parse only the inline assembly fragments (antlr backend)"
+    )
+    parser.add_argument(
+        "--ll",
+        action="store_true",
+        help="Always use full LL prediction (antlr backend)"
+    )
+    parser.add_argument(
+        "--lean",
+        action="store_true",
+        help="Build the trees of the inline assembly only (antlr backend), "
+             "as analyze_contracts.py does without -c"
+    )
+    parser.add_argument(
+        "--no-memo",
+        action="store_true",
+        help="Do not memoize the results of identical fragments"
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Parse the corpus with a (new, empty) parse cache"
+    )
+    parser.add_argument(
+        "--set",
+        type=axis_values,
+        action="append",
+        default=[],
+        metavar="AXIS=VALUE",
+        help="Change a parameter of the base corpus "
+             f"(default: {json.dumps(DEFAULTS)})"
+    )
+    parser.add_argument(
+        "--vary",
+        type=axis_values,
+        action="append",
+        default=[],
+        metavar="AXIS=V1,V2",
+        help="Benchmark these values of an axis (default: "
+             + ' '.join(f"{axis}={','.join(map(str, values))}"
+                        for axis, values in DEFAULT_AXES.items()) + ")"
+    )
+    parser.add_argument(
+        "--base-only",
+        action="store_true",
+        help="Benchmark only the base corpus"
+    )
+    return parser.parse_args()
+
+
+def get_configs(base, axes):
+    """Return the (label, parameters) of the base and of every axis value."""
+    configs = [('base', base)]
+    for axis, values in axes.items():
+        for value in values:
+            if value != base[axis]:
+                configs.append((f"{axis}={value}",
+                                dict(base, **{axis: value})))
+    return configs
+
+
+def get_commit():
+    """Return the commit of the repository and if it has changes, or None."""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=cwd, capture_output=True,
+            text=True, check=True).stdout.strip()
+        status = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=cwd, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return {'commit': commit, 'dirty': bool(status.strip())}
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+
+def summarize(times):
+    return {'min': min(times), 'median': statistics.median(times),
+            'times': times}
+
+
+class Benchmark:
+
+    def __init__(self, args):
+        self.args = args
+
+    def new_backend(self):
+        # A new memo for every run, so that runs do not reuse results
+        memo = None if self.args.no_memo else FragmentMemo(
+            namespace=f"{PARSER_VERSION}:{self.args.backend}")
+        if self.args.backend == FastBackend.name:
+            return FastBackend(memo=memo)
+        return AntlrBackend(fragments=self.args.fragments,
+                            two_stage=not self.args.ll, lean=self.args.lean,
+                            memo=memo)
+
+    def run_once(self, directory, sources):
+        times = {}
+        backend = self.new_backend()
+        times['parse'], _ = timed(
+            lambda: [backend.parse(name, text) for name, text in sources])
+        backend = self.new_backend()
+        cache = None
+        if self.args.cache:
+            cache = ParseCache(os.path.join(os.path.dirname(directory),
+                                            'cache.sqlite'))
+        try:
+            times['parse_input'], data = timed(
+                lambda: parse_input(directory, backend, cache=cache))
+        finally:
+            if cache is not None:
+                cache.close()
+                os.remove(cache.path)
+        times['compute'], _ = timed(lambda: compute_statistics(data))
+        times['statistics'], _ = timed(data.get_statistics)
+        times['to_json_results'], _ = timed(data.to_json_results)
+        return times
+
+    def run(self, params):
+        with tempfile.TemporaryDirectory() as directory:
+            corpus = os.path.join(directory, 'corpus')
+            size = generate_corpus(corpus, **params)
+            sources = []
+            for f in sorted(os.listdir(corpus)):
+                with open(os.path.join(corpus, f), 'r') as source:
+                    sources.append((os.path.join(corpus, f), source.read()))
+            # An untimed run, e.g., to fill the DFA caches of ANTLR
+            self.run_once(corpus, sources)
+            runs = [self.run_once(corpus, sources)
+                    for _ in range(self.args.repeat)]
+        timings = {m: summarize([run[m] for run in runs])
+                   for m in MEASUREMENTS}
+        return size, timings
+
+
+def compute_statistics(data):
+    for name in InlineAssemblyStatistics.SUMS:
+        data.compute(name, 'sum')
+    for name in InlineAssemblyStatistics.DICTS:
+        data.compute(name, 'dict')
+
+
+def _key(params):
+    return json.dumps(params, sort_keys=True)
+
+
+def get_options(args):
+    options = {'backend': args.backend, 'fragments': args.fragments,
+               'll': args.ll, 'lean': args.lean, 'memo': not args.no_memo,
+               'cache': args.cache, 'repeat': args.repeat}
+    if args.backend == FastBackend.name:
+        options.update(dict.fromkeys(ANTLR_OPTIONS))
+    return options
+
+
+def read_compared(path, options):
+    """
+    Return the results of an earlier run to compare with a run with options,
+    or exit with an error if they were run with other options.
+    """
+    with open(path, 'r') as f:
+        old = json.load(f)
+    old_options = old.get('options') or {}
+    differences = []
+    for name in COMPARED_OPTIONS:
+        if name not in old_options:
+            print(f"warning: {path} does not record the option {name}",
+                  file=sys.stderr)
+        elif old_options[name] != options[name]:
+            differences.append(f"{name}={old_options[name]} "
+                               f"(now {options[name]})")
+    if differences:
+        sys.exit(f"error: {path} was run with other options: "
+                 + ', '.join(differences))
+    return old
+
+
+def compare(results, old, path):
+    """Print the ratio of the min times of results to old, read from path."""
+    old_results = {_key(r['params']): r for r in old['results']}
+    print()
+    commit = (old.get('git') or {}).get('commit')
+    print(f"Compared with {path} (commit: {commit}), new/old min time:")
+    print(f"  {'configuration':<24}"
+          + ''.join(f"{m:>18}" for m in MEASUREMENTS))
+    for result in results:
+        old_result = old_results.get(_key(result['params']))
+        if old_result is None:
+            print(f"  {result['label']:<24} (not in {path})")
+            continue
+        ratios = []
+        for m in MEASUREMENTS:
+            # Measurements that the older run did not have are skipped
+            old_time = old_result['timings'].get(m, {}).get('min')
+            ratios.append(result['timings'][m]['min'] / old_time
+                          if old_time else float('nan'))
+        print(f"  {result['label']:<24}"
+              + ''.join(f"{ratio:>18.2f}" for ratio in ratios))
+
+
+def main():
+    args = get_args()
+    options = get_options(args)
+    old = None
+    if args.compare:
+        # Before the benchmark, which takes a while
+        old = read_compared(args.compare, options)
+    base = dict(DEFAULTS)
+    for axis, values in args.set:
+        base[axis] = values[0]
+    axes = {}
+    if not args.base_only:
+        axes = dict(args.vary) if args.vary else dict(DEFAULT_AXES)
+    benchmark = Benchmark(args)
+    results = []
+    print(f"  {'configuration':<24}{'files':>7}{'bytes':>10}{'fragments':>11}"
+          + ''.join(f"{m:>18}" for m in MEASUREMENTS))
+    for label, params in get_configs(base, axes):
+        size, timings = benchmark.run(params)
+        results.append({'label': label, 'params': params, 'corpus': size,
+                        'timings': timings})
+        print(f"  {label:<24}{size['files']:>7}{size['bytes']:>10}"
+              f"{size['fragments']:>11}"
+              + ''.join(f"{timings[m]['min']:>17.3f}s" for m in MEASUREMENTS),
+              flush=True)
+    if args.output:
+        output = {
+            'git': get_commit(),
+            'parser_version': PARSER_VERSION,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'options': options,
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+    if old is not None:
+        compare(results, old, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,18 @@
 Find which contracts contain inline assembly fragments.
 """
 import argparse
-import os
 import json
 
+from library.store import open_results
+
 
 def get_args():
     parser = argparse.ArgumentParser(
         description='Print contracts containing inline assembly.')
     parser.add_argument(
-        "directory", help="Directory that contains the results of the parser."
+        "directory",
+        help="Directory that contains the results of the parser (results "
+             "files or a store of run_parser.py --store)."
     )
     parser.add_argument(
         "duplicates", help="JSON file containing duplicates."
@@ -18,21 +21,13 @@ def get_args():
     return parser.parse_args()
 
 
-def find_files(directory):
-    """Find json files that need to process"""
-    return [os.path.join(directory, f) for f in os.listdir(directory)
-            if not f.endswith(".swp")]
-
-
-def process_json(path):
-    """Read JSON files and returns if it has assembly"""
-    with open(path, 'r') as infile:
-        data = json.load(infile)
+def process_json(results):
+    """Check if the (file, results) pairs of a contract have assembly"""
     # When we analyze multiple files, then we may get the results for
     # some contracts multiple times. Hence, we want to get all contracts
     # only once.
     contracts = {c: v
-                 for f, res in data.items()
+                 for f, res in results
                  for c, v in res['contracts'].items()}
     for v in contracts.values():
         if v["stats"]["has_assembly"]:
@@ -41,12 +36,11 @@ def process_json(path):
     return False
 
 
-def process_results(json_files):
-    """Read JSON files and compute results"""
+def process_results(results):
+    """Read the results of every contract and compute results"""
     addresses = set()
-    for f in json_files:
-        address = os.path.basename(f).replace('.json', '')
-        has_assembly = process_json(f)
+    for address, contract_results in results.scan():
+        has_assembly = process_json(contract_results)
         if has_assembly:
             addresses.add(address)
     return addresses
@@ -54,10 +48,10 @@ def process_results(json_files):
 
 def main():
     args = get_args()
-    json_files = find_files(args.directory)
     with open(args.duplicates) as f:
         duplicates = json.load(f)
-    addresses = process_results(json_files)
+    with open_results(args.directory) as results:
+        addresses = process_results(results)
     contain_assembly = set()
     for addr in addresses:
         addr_hash = duplicates['addresses'][addr]
@@ -15,6 +15,8 @@ from tqdm import tqdm
 
 from library.assembly_types import OPCODES, OLD_OPCODES, HIGH_LEVEL_CONSTRUCTS, \
     DECLARATIONS, SPECIAL
+from library.store import open_results
+from library.sources import SourceReader
 
 
 INSTRUCTION_TYPES = {
@@ -45,6 +47,10 @@ ADDRESS_LABEL_ID = 1
 #FIXME TODO
 ROWS_LIMIT = 10000
 
+# The code of the fragments is read from the parsed files, unless it is saved
+# in the results (analyze_contracts.py --fragment-code)
+SOURCES = SourceReader()
+
 
 convert_wei = lambda x: int(x) / 1000000000000000000 if x is not None else None
 # This will work only on UNIX filesystems
@@ -68,7 +74,9 @@ def get_args():
         "etherscan_data", help="JSON file containing etherscan data."
     )
     parser.add_argument(
-        "parser", help="Directory containing parser's analysis results."
+        "parser",
+        help="Directory containing parser's analysis results (results files "
+             "or a store of run_parser.py --store)."
     )
     parser.add_argument(
         "output",
@@ -166,7 +174,7 @@ def process_parser_res(address, contracts_lookup, parser_results):
                 start_line = fragment['original_lines']['start']['line']
                 end_line = fragment['original_lines']['end']['line']
                 lines = fragment['lines']
-                code = fragment['code']
+                code = SOURCES.get_fragment_code(f, fragment)
                 # ['fragment_id', 'lines', 'start_line', 'end_line', 'code',
                 #  'hash', 'contract_id']
                 sha256 = hashlib.sha256(code.encode('utf-8')).hexdigest()
@@ -236,12 +244,10 @@ def get_assembly_path(directory, duplicates, address):
 def get_parser_results(parser, addresses):
     res = None
     for addr in addresses:
-        path = os.path.join(parser, addr + '.json')
-        if not os.path.isfile(path):
-            continue
-        with open(path, 'r') as f:
-            res = json.load(f)
-        break
+        # addr.json, addr.jsonl, or addr in a store
+        res = parser.get(addr)
+        if res is not None:
+            break
     return res
 
 
@@ -435,7 +441,8 @@ def main():
     del lines
     del etherscan_data
     print("Process results (duplicates)")
-    results = process_results(args.output, contracts, duplicates, args.parser)
+    with open_results(args.parser) as parser:
+        results = process_results(args.output, contracts, duplicates, parser)
     results.extend(create_instruction_tables_csv(args.output))
     if args.labels:
         print("Process Labels")
@@ -0,0 +1,69 @@
+"""
+Split a list of contract paths into the contracts that contain inline
+assembly and the contracts that do not, ignoring comments and strings.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+
+from library.scanner import path_has_assembly
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        description='Find contracts containing inline assembly.')
+    parser.add_argument(
+        "paths",
+        help="File with the paths of the contracts (files or directories), "
+             "one per line (e.g., unique_paths.txt)"
+    )
+    parser.add_argument(
+        "assembly", help="Output file for the paths with assembly."
+    )
+    parser.add_argument(
+        "non_assembly", help="Output file for the paths without assembly."
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of processes (default: number of CPUs)"
+    )
+    return parser.parse_args()
+
+
+def read_paths(path):
+    with open(path, 'r') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def check_path(path):
+    """Return (path, has assembly), or (path, None) if path is missing."""
+    if not os.path.exists(path):
+        return path, None
+    return path, path_has_assembly(path)
+
+
+def main():
+    args = get_args()
+    paths = read_paths(args.paths)
+    chunksize = max(1, min(256, len(paths) // (args.jobs * 4)))
+    counts = {True: 0, False: 0, None: 0}
+    with open(args.assembly, 'w') as assembly, \
+            open(args.non_assembly, 'w') as non_assembly, \
+            multiprocessing.Pool(args.jobs) as pool:
+        for path, found in pool.imap(check_path, paths, chunksize):
+            counts[found] += 1
+            if found is None:
+                print(f"error: {path} does not exist", file=sys.stderr)
+            elif found:
+                assembly.write(path + '\n')
+            else:
+                non_assembly.write(path + '\n')
+    print(f"With assembly: {counts[True]}, without assembly: "
+          f"{counts[False]}, missing: {counts[None]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -176,3 +176,40 @@ SPECIAL = {
     'memoryguard': 7,
     'verbatim': 8,
 }
+
+# Compact counters of the inline assembly fragments (see
+# InlineAssemblyFragment in analyze_contracts.py). Every instruction and
+# every counted construct has an id, i.e., an index into one array of
+# counters. Instructions keep the precedence OPCODES, OLD_OPCODES, SPECIAL.
+INSTRUCTION_CATEGORIES = (
+    ('OPCODES', OPCODES),
+    ('OLD_OPCODES', OLD_OPCODES),
+    ('SPECIAL', SPECIAL),
+)
+
+INSTRUCTION_IDS = {}
+INSTRUCTION_RANGES = {}
+for _category, _instructions in INSTRUCTION_CATEGORIES:
+    _first = len(INSTRUCTION_IDS)
+    for _name in _instructions:
+        INSTRUCTION_IDS.setdefault(_name, len(INSTRUCTION_IDS))
+    INSTRUCTION_RANGES[_category] = (_first, len(INSTRUCTION_IDS))
+del _category, _instructions, _first, _name
+
+INSTRUCTION_NAMES = list(INSTRUCTION_IDS)
+
+CONSTRUCTS = (
+    'assignments',
+    'functions',
+    'definitions',
+    'label_definitions',
+    'if_stmts',
+    'switch_stmts',
+    'for_stmts',
+    'calls',
+)
+
+CONSTRUCT_IDS = {construct: len(INSTRUCTION_IDS) + i
+                 for i, construct in enumerate(CONSTRUCTS)}
+
+TOTAL_COUNTERS = len(INSTRUCTION_IDS) + len(CONSTRUCTS)
@@ -0,0 +1,123 @@
+"""
+Per-file CPU time and memory budgets, and the quarantine manifest of the
+files that exceed them.
+
+A Budget is checked by a SIGPROF timer that fires every TICK seconds of CPU
+time of the process, hence, it interrupts the pure-Python ANTLR parser
+wherever it is. It works only in the main thread of Unix processes.
+
+The quarantine manifest is a JSON lines file with one record
+{"file": path, "reason": reason, "cpu_time": seconds, "rss": bytes} per
+file. Records are appended, so several processes can share a manifest.
+"""
+import json
+import os
+import signal
+import sys
+import time
+
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def get_rss():
+    """Return the resident set size of the process in bytes, or None."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class BudgetExceeded(Exception):
+
+    def __init__(self, reason, cpu_time, rss=None):
+        super().__init__(reason, cpu_time, rss)
+        self.reason = reason
+        self.cpu_time = cpu_time
+        self.rss = rss
+        # The file that exceeded the budget, if known
+        self.file = None
+
+    def __str__(self):
+        return self.reason
+
+
+class Budget:
+    """
+    The CPU time (in seconds) and the growth of the RSS of the process (in
+    bytes) that a single file may take. None means no limit. Use it as a
+    context manager around the parse of a file, which raises BudgetExceeded
+    when a limit is exceeded. The RSS is measured from the start of the
+    parse, since a long-lived process (e.g., --serve) keeps the memory of
+    earlier files.
+    """
+
+    # Seconds of CPU time between two checks
+    TICK = 0.05
+
+    def __init__(self, cpu_time=None, rss=None):
+        self.cpu_time = cpu_time
+        self.rss = rss
+        self._start = None
+        self._rss = None
+        self._handler = None
+
+    def _check(self, signum, frame):
+        cpu_time = time.process_time() - self._start
+        if self.cpu_time is not None and cpu_time > self.cpu_time:
+            raise BudgetExceeded(
+                f"CPU time over {self.cpu_time:g}s", cpu_time, get_rss())
+        if self.rss is not None and self._rss is not None:
+            rss = get_rss()
+            if rss is not None and rss - self._rss > self.rss:
+                raise BudgetExceeded(
+                    f"RSS growth over {self.rss // 2**20} MiB", cpu_time, rss)
+
+    def __enter__(self):
+        self._start = time.process_time()
+        self._rss = get_rss() if self.rss is not None else None
+        self._handler = signal.signal(signal.SIGPROF, self._check)
+        signal.setitimer(signal.ITIMER_PROF, self.TICK, self.TICK)
+        return self
+
+    def __exit__(self, *exc):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._handler)
+
+
+class Quarantine:
+    """
+    Record the files that exceeded their Budget to the manifest path, or
+    only to stderr if path is None.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.files = 0
+
+    def add(self, error):
+        """Record the BudgetExceeded error of a file."""
+        self.files += 1
+        print(f"Quarantined {error.file}: {error.reason}", file=sys.stderr)
+        if self.path is None:
+            return
+        record = {'file': error.file, 'reason': error.reason,
+                  'cpu_time': round(error.cpu_time, 3), 'rss': error.rss}
+        # A single write of a whole line, so that appends do not interleave
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+
+def iter_quarantine(path):
+    """Yield the records of a quarantine manifest."""
+    with open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def get_quarantined_files(path):
+    """Return the files of a quarantine manifest, without duplicates."""
+    return list(dict.fromkeys(record['file']
+                              for record in iter_quarantine(path)))
@@ -0,0 +1,147 @@
+"""
+Caches of parse results.
+
+ParseCache is a content-addressed cache of the results of whole files,
+stored in a single sqlite3 file. Results are keyed by the sha256 of the
+source code together with the parser version and options, hence, duplicate
+sources are parsed only once, no matter their path, and results of older
+parser versions are never reused.
+
+FragmentMemo is an in-process LRU cache of the results of single inline
+assembly fragments, keyed by the sha256 of their tokens, which can be
+optionally saved to a file.
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+import zlib
+
+from collections import OrderedDict
+
+
+class ParseCache:
+
+    # Write the new results after this many (and on close). They are kept
+    # in memory until then, so that the write transaction, which locks the
+    # cache for the other processes, is short.
+    COMMIT_EVERY = 100
+
+    def __init__(self, path, timeout=60):
+        self.path = path
+        # The timeout lets several processes share the same cache.
+        self.con = sqlite3.connect(path, timeout=timeout)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute(
+            "CREATE TABLE IF NOT EXISTS results "
+            "(key TEXT PRIMARY KEY, data BLOB NOT NULL)"
+        )
+        self.con.commit()
+        self.hits = 0
+        self.misses = 0
+        # key -> data of the results that have not been written yet
+        self._pending = {}
+
+    @staticmethod
+    def key(text, *options):
+        """
+        Return the cache key of the source text (or the bytes of the file)
+        and the parser options.
+        """
+        if isinstance(text, str):
+            text = text.encode('utf-8')
+        h = hashlib.sha256(text)
+        for option in options:
+            h.update(b'\0' + str(option).encode('utf-8'))
+        return h.hexdigest()
+
+    def get(self, key):
+        data = self._pending.get(key)
+        if data is None:
+            row = self.con.execute(
+                "SELECT data FROM results WHERE key = ?", (key,)).fetchone()
+            data = row[0] if row is not None else None
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(zlib.decompress(data))
+
+    def put(self, key, value):
+        self._pending[key] = zlib.compress(
+            pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        if len(self._pending) >= self.COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        """Write the new results in a single short transaction."""
+        if not self._pending:
+            return
+        with self.con:
+            self.con.executemany(
+                "INSERT OR REPLACE INTO results (key, data) VALUES (?, ?)",
+                self._pending.items())
+        self._pending = {}
+
+    def close(self):
+        self.commit()
+        self.con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FragmentMemo:
+
+    def __init__(self, maxsize=65536, path=None, namespace=''):
+        """
+        namespace is part of every key, so that the results of different
+        parsers (or parser versions) can be saved in the same file.
+        """
+        self.maxsize = maxsize
+        self.path = path
+        self.namespace = namespace.encode('utf-8')
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        if path is not None and os.path.isfile(path):
+            with open(path, 'rb') as f:
+                self._entries.update(pickle.load(f))
+
+    def key(self, texts):
+        """
+        Return the key of a fragment from the texts of its tokens, i.e.,
+        ignoring whitespace and comments.
+        """
+        h = hashlib.sha256(self.namespace)
+        h.update('\n'.join(texts).encode('utf-8'))
+        return h.digest()
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def save(self):
+        if self.path is None:
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(dict(self._entries), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    def __len__(self):
+        return len(self._entries)
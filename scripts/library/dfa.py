@@ -0,0 +1,160 @@
+"""
+Save and load the DFA caches of SolidityLexer and SolidityParser.
+
+The ANTLR Python runtime fills the DFA of every decision lazily, while it
+parses, and most of the time of the first files goes into that. The caches
+are class attributes, shared by all the lexers and parsers of a process,
+so they can be warmed up once (e.g., before forking workers) or saved to
+a file and loaded by later processes.
+
+The runtime compares a few singletons by identity (e.g., SemanticContext.NONE
+and PredictionContext.EMPTY), so they are pickled by name and replaced by
+the singletons of the loading process. It also caches hash codes that
+depend on the hashes of strings, which differ across processes, so the
+objects that cache them, and the dicts keyed by them, are rebuilt.
+"""
+import hashlib
+import os
+import pickle
+import sys
+
+from antlr4.atn.ATNSimulator import ATNSimulator
+from antlr4.atn.LexerActionExecutor import LexerActionExecutor
+from antlr4.atn.LexerATNSimulator import LexerATNSimulator
+from antlr4.atn.SemanticContext import SemanticContext
+from antlr4.dfa.DFA import DFA
+from antlr4.PredictionContext import PredictionContext, \
+    PredictionContextCache, SingletonPredictionContext, \
+    ArrayPredictionContext
+from antlr4.RuleContext import RuleContext
+from solidity_parser.solidity_antlr4 import SolidityLexer as lexer_module
+from solidity_parser.solidity_antlr4 import SolidityParser as parser_module
+from solidity_parser.solidity_antlr4.SolidityLexer import SolidityLexer
+from solidity_parser.solidity_antlr4.SolidityParser import SolidityParser
+
+
+# Bump it whenever the saved data changes
+DFA_FORMAT_VERSION = 1
+
+SINGLETONS = {
+    'SemanticContext.NONE': SemanticContext.NONE,
+    'PredictionContext.EMPTY': PredictionContext.EMPTY,
+    'ATNSimulator.ERROR': ATNSimulator.ERROR,
+    'LexerATNSimulator.ERROR': LexerATNSimulator.ERROR,
+    'RuleContext.EMPTY': RuleContext.EMPTY,
+}
+
+# The DFA states link to each other, hence, pickle recurses deeply.
+RECURSION_LIMIT = 100000
+
+
+class _Pickler(pickle.Pickler):
+
+    _names = {id(obj): name for name, obj in SINGLETONS.items()}
+
+    def persistent_id(self, obj):
+        return self._names.get(id(obj))
+
+    def reducer_override(self, obj):
+        # Recompute the cached hash codes when loading
+        cls = type(obj)
+        if cls is SingletonPredictionContext:
+            return cls, (obj.parentCtx, obj.returnState)
+        if cls is ArrayPredictionContext:
+            return cls, (obj.parents, obj.returnStates)
+        if cls is LexerActionExecutor:
+            return cls, (obj.lexerActions,)
+        if cls is DFA:
+            return _make_dfa, (obj.atnStartState, obj.decision, obj.s0,
+                               obj.precedenceDfa, list(obj._states))
+        if cls is PredictionContextCache:
+            return _make_context_cache, (list(obj.cache),)
+        return NotImplemented
+
+
+def _make_dfa(atnStartState, decision, s0, precedenceDfa, states):
+    dfa = DFA.__new__(DFA)
+    dfa.atnStartState = atnStartState
+    dfa.decision = decision
+    dfa.s0 = s0
+    dfa.precedenceDfa = precedenceDfa
+    for state in states:
+        state.configs.cachedHashCode = -1
+    dfa._states = {state: state for state in states}
+    return dfa
+
+
+def _make_context_cache(contexts):
+    cache = PredictionContextCache()
+    cache.cache = {context: context for context in contexts}
+    return cache
+
+
+class _Unpickler(pickle.Unpickler):
+
+    def persistent_load(self, pid):
+        return SINGLETONS[pid]
+
+
+def get_grammar_id():
+    """
+    Return an id of the serialized ATNs of the lexer and the parser, so that
+    the DFA of another grammar (or solidity-parser version) is not loaded.
+    """
+    h = hashlib.sha256(lexer_module.serializedATN().encode('utf-8'))
+    h.update(parser_module.serializedATN().encode('utf-8'))
+    return h.hexdigest()
+
+
+def _get_caches():
+    return (SolidityLexer.atn, SolidityLexer.decisionsToDFA,
+            SolidityParser.atn, SolidityParser.decisionsToDFA,
+            SolidityParser.sharedContextCache)
+
+
+def _set_caches(caches):
+    (SolidityLexer.atn, SolidityLexer.decisionsToDFA,
+     SolidityParser.atn, SolidityParser.decisionsToDFA,
+     SolidityParser.sharedContextCache) = caches
+
+
+def count_dfa_states():
+    """Return the number of DFA states of the lexer and the parser."""
+    return sum(len(dfa._states) for dfa in
+               SolidityLexer.decisionsToDFA + SolidityParser.decisionsToDFA)
+
+
+def save_dfa(path):
+    """Save the DFA caches of the current process to path."""
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, RECURSION_LIMIT))
+    tmp = path + '.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            pickle.dump((DFA_FORMAT_VERSION, get_grammar_id()), f,
+                        pickle.HIGHEST_PROTOCOL)
+            _Pickler(f, pickle.HIGHEST_PROTOCOL).dump(_get_caches())
+    finally:
+        sys.setrecursionlimit(limit)
+    os.replace(tmp, path)
+
+
+def load_dfa(path):
+    """
+    Replace the DFA caches of the current process with the ones saved to
+    path. Return False (and keep the current caches) if path is missing or
+    was saved by another version or grammar.
+    """
+    if not os.path.isfile(path):
+        return False
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, RECURSION_LIMIT))
+    try:
+        with open(path, 'rb') as f:
+            if pickle.load(f) != (DFA_FORMAT_VERSION, get_grammar_id()):
+                return False
+            caches = _Unpickler(f).load()
+    finally:
+        sys.setrecursionlimit(limit)
+    _set_caches(caches)
+    return True
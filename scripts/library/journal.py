@@ -0,0 +1,111 @@
+"""
+A crash-safe journal of the inputs of a batch run (see run_parser.py).
+
+The journal is an append-only JSON lines file with one record
+{"path": path, "hash": sha256, "state": state, "time": time} per change of
+the state of an input (started, completed, or failed), plus the "output" of
+completed inputs and the "error" of failed ones. Every completed or failed
+record is flushed to disk (fsync) before the run goes on, and a record
+truncated by a crash is ignored, hence, the last state of an input that is
+"completed" means that its output has been written (atomically) before.
+Started records are only informative (a crash loses at most some of them),
+so they are not synced.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from library.scanner import get_source_files
+
+
+STARTED = 'started'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+
+def hash_input(path):
+    """
+    Return the sha256 of the file path, or of the names and contents of the
+    .sol files of the directory path.
+    """
+    h = hashlib.sha256()
+    for f in sorted(get_source_files(path)):
+        h.update(os.path.relpath(f, path).encode('utf-8') + b'\0')
+        with open(f, 'rb') as source:
+            h.update(source.read())
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class Journal:
+    """The journal file path. It can be shared by the threads of a run."""
+
+    def __init__(self, path):
+        self.path = path
+        # The last record of every path
+        self.records = {}
+        if os.path.isfile(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Truncated by a crash
+                        continue
+                    self.records[record['path']] = record
+        self._lock = threading.Lock()
+        self._file = open(path, 'a')
+        if self._file.tell() > 0 and not self._ends_with_newline():
+            # Terminate a line truncated by a crash
+            self._file.write('\n')
+
+    def _add(self, path, input_hash, state, sync=True, **kwargs):
+        record = dict(path=path, hash=input_hash, state=state,
+                      time=round(time.time(), 3), **kwargs)
+        line = json.dumps(record) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+            self.records[path] = record
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def start(self, path, input_hash):
+        self._add(path, input_hash, STARTED, sync=False)
+
+    def complete(self, path, input_hash, output):
+        self._add(path, input_hash, COMPLETED, output=output)
+
+    def fail(self, path, input_hash, error):
+        self._add(path, input_hash, FAILED, error=error)
+
+    def is_completed(self, path, output, exists=os.path.isfile):
+        """
+        Check if path has been completed into output, which still exists
+        (see exists), and it has not changed since (i.e., it has the same
+        hash).
+        """
+        record = self.records.get(path)
+        return (record is not None and record['state'] == COMPLETED
+                and record.get('output') == output
+                and exists(output)
+                and record['hash'] == hash_input(path))
+
+    def __contains__(self, path):
+        return path in self.records
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
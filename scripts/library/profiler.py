@@ -0,0 +1,136 @@
+"""
+Per-file profiles of analyze_contracts.py (--profile).
+
+A profile has the time of every phase of a file in seconds (reading and
+decoding, lexing, parsing, visiting the parse tree, aggregating the results
+with to_json_results, and serializing them), the number of tokens and
+parse tree nodes, and the peak RSS of the process while the file was
+processed. Profiles are appended to a CSV file, one row per file, so that
+several processes can share it, and they can be summarized later.
+"""
+import csv
+import heapq
+import io
+import os
+import resource
+
+
+PHASES = ('read', 'lex', 'parse', 'visit', 'aggregate', 'serialize')
+COUNTS = ('tokens', 'nodes', 'peak_rss')
+FIELDS = ('file', 'cached', 'total') + PHASES + COUNTS
+
+
+def new_profile():
+    profile = dict.fromkeys(PHASES, 0.0)
+    profile.update(dict.fromkeys(COUNTS, 0))
+    profile['cached'] = False
+    return profile
+
+
+def reset_peak_rss():
+    """Reset the peak RSS of the process (Linux), if possible."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def get_peak_rss():
+    """
+    Return the peak RSS of the process in bytes since reset_peak_rss, or
+    since the process started if it cannot be reset.
+    """
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Profiler:
+    """Append profiles to the CSV file path, and keep a summary of them."""
+
+    def __init__(self, path, top=10):
+        self.path = path
+        self.summary = ProfileSummary(top)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            self._write(FIELDS)
+
+    def _write(self, row):
+        line = io.StringIO()
+        csv.writer(line).writerow(row)
+        # A single write of a whole line, so that appends do not interleave
+        with open(self.path, 'a', newline='') as f:
+            f.write(line.getvalue())
+
+    def add(self, name, profile):
+        row = dict(profile, file=name,
+                   total=sum(profile[phase] for phase in PHASES))
+        self.summary.add(row)
+        self._write([_format(row[field]) for field in FIELDS])
+
+
+def _format(value):
+    if isinstance(value, float):
+        return f"{value:.6f}"
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+class ProfileSummary:
+    """The total time of each phase and the top slowest files."""
+
+    def __init__(self, top=10):
+        self.top = top
+        self.files = 0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self._slowest = []
+
+    def add(self, row):
+        self.files += 1
+        for phase in PHASES:
+            self.phases[phase] += row[phase]
+        item = (row['total'], self.files, row)
+        if len(self._slowest) < self.top:
+            heapq.heappush(self._slowest, item)
+        else:
+            heapq.heappushpop(self._slowest, item)
+
+    def print(self):
+        total = sum(self.phases.values())
+        print(f"Profiled files: {self.files} (time: {total:.2f}s)")
+        for phase, value in self.phases.items():
+            share = value / total * 100 if total else 0.0
+            print(f"  {phase}: {value:.2f}s ({share:.1f}%)")
+        print(f"Top {len(self._slowest)} slowest files:")
+        for _, _, row in sorted(self._slowest, key=lambda item: -item[0]):
+            phase = max(PHASES, key=lambda p: row[p])
+            print(f"  {row['total']:.2f}s {row['file']} (tokens: "
+                  f"{row['tokens']}, nodes: {row['nodes']}, peak RSS: "
+                  f"{row['peak_rss'] // 2**20} MiB, slowest phase: {phase})")
+
+
+def read_profile(path):
+    """Yield the rows of a profile CSV file as dicts."""
+    with open(path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            for phase in PHASES + ('total',):
+                row[phase] = float(row[phase])
+            for count in COUNTS:
+                row[count] = int(row[count])
+            row['cached'] = row['cached'] == '1'
+            yield row
+
+
+def summarize_profile(path, top=10):
+    """Return the ProfileSummary of a profile CSV file."""
+    summary = ProfileSummary(top)
+    for row in read_profile(path):
+        summary.add(row)
+    return summary
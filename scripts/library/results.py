@@ -0,0 +1,79 @@
+"""
+Write and read the results of analyze_contracts.py.
+
+The results are saved either as one JSON object that maps the path of
+every analyzed file to its results (the default), or as JSON lines
+(.jsonl files) with one record {"file": path, "results": results} per
+file. JSON lines are written and read one file at a time.
+"""
+import json
+import os
+
+
+JSONL_EXTENSION = '.jsonl'
+RESULTS_EXTENSIONS = ('.json', JSONL_EXTENSION)
+
+
+def is_jsonl(path):
+    return path.endswith(JSONL_EXTENSION)
+
+
+def write_results(results, f):
+    """
+    Write the (name, JSON results) pairs of results to f as one JSON object,
+    i.e., the same as json.dump of a dict, but one file at a time.
+    """
+    f.write('{')
+    for i, (name, res) in enumerate(results):
+        if i > 0:
+            f.write(', ')
+        f.write(json.dumps(name) + ': ')
+        json.dump(res, f)
+    f.write('}')
+
+
+def write_results_jsonl(results, f):
+    """Write the (name, JSON results) pairs of results to f as JSON lines."""
+    for name, res in results:
+        f.write(json.dumps({'file': name, 'results': res}) + '\n')
+
+
+def iter_results(path):
+    """
+    Yield the (name, JSON results) pairs of a results file. The format is
+    detected by the extension of path.
+    """
+    with open(path, 'r') as f:
+        if is_jsonl(path):
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record['file'], record['results']
+        else:
+            yield from json.load(f).items()
+
+
+def load_results(path):
+    """Return the results of a results file as a dict (as json.load)."""
+    return dict(iter_results(path))
+
+
+def get_results_name(path):
+    """
+    Return the name of a results file without its extension, e.g., the
+    address of the contract.
+    """
+    name = os.path.basename(path)
+    for extension in RESULTS_EXTENSIONS:
+        if name.endswith(extension):
+            return name[:-len(extension)]
+    return name
+
+
+def find_results(directory, name):
+    """Return the path of the results file of name in directory, or None."""
+    for extension in RESULTS_EXTENSIONS:
+        path = os.path.join(directory, name + extension)
+        if os.path.isfile(path):
+            return path
+    return None
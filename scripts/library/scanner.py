@@ -0,0 +1,51 @@
+"""
+A fast pre-filter that finds the Solidity files with inline assembly.
+
+Unlike grep, it skips comments and string literals, and it matches only the
+assembly keyword, i.e., not the words that contain it (e.g., assemblyCode).
+The source code is scanned once with a single regular expression, and files
+without the substring "assembly" are not scanned at all.
+"""
+import os
+import re
+
+
+# Comments and strings as in library.tokenizer, so that their contents are
+# skipped, and the assembly keyword.
+_SCANNER = re.compile(r'''
+    //[^\n]*
+  | /\*.*?(?:\*/|\Z)
+  | "(?:\\.|[^"\r\n\\])*"
+  | '(?:\\.|[^'\r\n\\])*'
+  | (?<![a-zA-Z0-9$_])(?P<assembly>assembly)(?![a-zA-Z0-9$_])
+''', re.VERBOSE | re.DOTALL)
+
+
+def has_assembly(text):
+    """Check if the source code text has an assembly keyword."""
+    if 'assembly' not in text:
+        return False
+    for match in _SCANNER.finditer(text):
+        if match.lastgroup == 'assembly':
+            return True
+    return False
+
+
+def get_source_files(path):
+    """Return path if it is a file, or the .sol files of directory path."""
+    if os.path.isdir(path):
+        return [os.path.join(path, f) for f in os.listdir(path)
+                if os.path.isfile(os.path.join(path, f)) and '.sol' in f]
+    return [path]
+
+
+def path_has_assembly(path):
+    """
+    Check if the file path, or any .sol file of the directory path (a
+    contract with multiple files), has inline assembly.
+    """
+    for f in get_source_files(path):
+        with open(f, 'r', encoding='utf-8', errors='replace') as source:
+            if has_assembly(source.read()):
+                return True
+    return False
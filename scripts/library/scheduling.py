@@ -0,0 +1,90 @@
+"""
+Largest-first scheduling of the files (or contracts) of a batch.
+
+The parse time of a file grows with its size, and the sizes of the corpus
+are heavy-tailed. When the largest files are dispatched first (longest
+processing time first), the last files to finish are small ones, instead of
+a large file that keeps a single worker busy long after the others are idle.
+
+The cost of a path is its parse time recorded by a previous run, if any
+(see read_costs), or else its size, scaled by the seconds per byte of the
+recorded paths.
+"""
+import csv
+import heapq
+import os
+
+from library.scanner import get_source_files
+
+
+def get_size(path):
+    """
+    Return the size of the file path, or the total size of the .sol files of
+    the directory path.
+    """
+    try:
+        return sum(os.path.getsize(f) for f in get_source_files(path))
+    except OSError:
+        return 0
+
+
+def read_costs(path):
+    """
+    Return the total time of every file of a CSV file with "file" and
+    "total" columns, e.g., a --profile CSV of analyze_contracts.py or the
+    --timings CSV of run_parser.py. If a file has been recorded by several
+    runs, the last one is used.
+    """
+    with open(path, 'r', newline='') as f:
+        return {row['file']: float(row['total']) for row in csv.DictReader(f)}
+
+
+def _get_recorded_cost(path, costs, files):
+    if path in costs:
+        return costs[path]
+    # The files of a directory
+    return sum(costs[f] for f in files.get(path, ()))
+
+
+def order_largest_first(paths, costs=None):
+    """
+    Return paths (files or directories) ordered by decreasing cost, with
+    the recorded costs of previous runs (see read_costs) if given.
+    """
+    sizes = {path: get_size(path) for path in paths}
+    recorded = {}
+    if costs:
+        files = {}
+        for f in costs:
+            files.setdefault(os.path.dirname(f), []).append(f)
+        for path in paths:
+            cost = _get_recorded_cost(path, costs, files)
+            if cost > 0:
+                recorded[path] = cost
+    recorded_bytes = sum(sizes[path] for path in recorded)
+    # Seconds per byte, to estimate the paths without a recorded cost
+    rate = sum(recorded.values()) / recorded_bytes if recorded_bytes else 1.0
+
+    def get_cost(path):
+        cost = recorded.get(path)
+        return cost if cost is not None else sizes[path] * rate
+
+    return sorted(paths, key=get_cost, reverse=True)
+
+
+def split_balanced(paths, parts):
+    """
+    Split paths into parts lists with about the same total size, assigning
+    the largest path first to the list with the smallest total. Return the
+    lists and their total sizes.
+    """
+    sizes = {path: get_size(path) for path in paths}
+    heap = [(0, i) for i in range(parts)]
+    splits = [[] for _ in range(parts)]
+    totals = [0] * parts
+    for path in sorted(paths, key=lambda p: (-sizes[p], p)):
+        total, i = heapq.heappop(heap)
+        splits[i].append(path)
+        totals[i] = total + sizes[path]
+        heapq.heappush(heap, (totals[i], i))
+    return splits, totals
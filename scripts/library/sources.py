@@ -0,0 +1,80 @@
+"""
+Read the code of inline assembly fragments out of the original source files.
+
+The results of analyze_contracts.py locate every fragment by the byte
+offsets of its first character and of the character after its last one
+("original_bytes"), within the file whose results contain it. The code is
+sliced out of a memory map of the file, hence, only the bytes of the
+fragment are read and decoded (with universal newlines, as the parser reads
+the file).
+"""
+import mmap
+import os
+
+from collections import OrderedDict
+
+
+def _map(path):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _decode(data):
+    code = data.decode('utf-8')
+    if '\r' in code:
+        code = code.replace('\r\n', '\n').replace('\r', '\n')
+    return code
+
+
+def read_code(path, start, end):
+    """Return the code between the byte offsets start and end of path."""
+    data = _map(path)
+    try:
+        return _decode(data[start:end])
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+
+class SourceReader:
+    """
+    Like read_code, but keep the memory maps of the last maxsize files open,
+    e.g., to read all the fragments of the files one after the other.
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._maps = OrderedDict()
+
+    def read_code(self, path, start, end):
+        data = self._maps.get(path)
+        if data is None:
+            data = self._maps[path] = _map(path)
+            if len(self._maps) > self.maxsize:
+                _, old = self._maps.popitem(last=False)
+                if isinstance(old, mmap.mmap):
+                    old.close()
+        else:
+            self._maps.move_to_end(path)
+        return _decode(data[start:end])
+
+    def get_fragment_code(self, path, fragment):
+        """Return the code of the JSON results of a fragment of file path."""
+        if 'code' in fragment:
+            return fragment['code']
+        offsets = fragment['original_bytes']
+        return self.read_code(path, offsets['start'], offsets['end'])
+
+    def close(self):
+        for data in self._maps.values():
+            if isinstance(data, mmap.mmap):
+                data.close()
+        self._maps.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
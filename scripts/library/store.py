@@ -0,0 +1,309 @@
+"""
+A segmented store of the results of many contracts (see run_parser.py
+--store), instead of one results file per contract.
+
+The results of every contract are appended, as JSON lines (see
+library.results), to large segment files (segment-<n>.seg), and the index
+(index.jsonl) has one record {"name": name, "segment": n, "offset": offset,
+"length": length} per contract, which is appended after its results. Hence,
+the store has a few large files no matter the number of contracts, a
+contract is read with a single read of its segment, and a scan reads the
+segments sequentially. The segment and the index are synced to disk every
+SYNC_EVERY contracts (and on close), the segment first. A record of the
+index that is truncated by a crash, or that is not valid (e.g., it is past
+the end of its segment, which was not synced), is ignored together with the
+earlier records of its contract, which is parsed again by run_parser.py
+--resume. When the store is opened for writing after a crash, the index is
+rewritten without the records that are not valid, and the last segment is
+truncated after the last valid record, so that new results never make a
+stale record valid again. If a contract has been written several times, the
+last record wins.
+
+A store has a single writer at a time (its lock file is locked), and any
+number of readers.
+
+ResultsDirectory has the same interface for a directory of results files.
+"""
+import fcntl
+import io
+import json
+import os
+import threading
+
+from library.results import RESULTS_EXTENSIONS, find_results, \
+    get_results_name, iter_results, load_results, write_results_jsonl
+
+
+INDEX = 'index.jsonl'
+LOCK = 'store.lock'
+# A new segment is started when the current one is over this size
+SEGMENT_SIZE = 256 * 2**20
+# Sync the segment and the index to disk after this many contracts
+SYNC_EVERY = 100
+
+
+class StoreError(Exception):
+    pass
+
+
+def is_store(directory):
+    return os.path.isfile(os.path.join(directory, INDEX))
+
+
+def _read_records(data):
+    for line in data.decode('utf-8').splitlines():
+        if line.strip():
+            record = json.loads(line)
+            yield record['file'], record['results']
+
+
+class ResultsStore:
+    """
+    The store in directory, opened for reading, or for writing (it is
+    created if it does not exist). Writes can be shared by the threads of a
+    process.
+    """
+
+    def __init__(self, directory, write=False, segment_size=SEGMENT_SIZE):
+        self.directory = directory
+        self.segment_size = segment_size
+        # name -> (segment, offset, length)
+        self.index = {}
+        self._fds = {}
+        self._lock = threading.Lock()
+        self._lock_file = None
+        self._index_file = None
+        self._segment_file = None
+        self._pending = 0
+        if write:
+            os.makedirs(directory, exist_ok=True)
+            self._lock_file = open(os.path.join(directory, LOCK), 'a')
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self._lock_file.close()
+                raise StoreError(f"{directory} is being written by another "
+                                 "process") from None
+        elif not is_store(directory):
+            raise StoreError(f"{directory} is not a results store")
+        invalid = self._load_index()
+        if write:
+            segments = [segment for segment, _, _ in self.index.values()]
+            self._segment = max(segments, default=0)
+            self._repair(invalid)
+            self._index_file = open(self._get_index(), 'a')
+            if self._index_file.tell() > 0 and not self._ends_with_newline():
+                # Terminate a line truncated by a crash
+                self._index_file.write('\n')
+                self._index_file.flush()
+
+    def _get_index(self):
+        return os.path.join(self.directory, INDEX)
+
+    def _get_segment(self, segment):
+        return os.path.join(self.directory, f"segment-{segment:05d}.seg")
+
+    def _load_index(self):
+        """Load the valid records of the index. Return if any is not."""
+        if not os.path.isfile(self._get_index()):
+            return False
+        invalid = False
+        sizes = {}
+        with open(self._get_index(), 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    name = record['name']
+                except (ValueError, TypeError, KeyError):
+                    # Truncated by a crash
+                    invalid = True
+                    continue
+                location = self._check_record(record, sizes)
+                if location is None:
+                    # E.g., the segment was not synced before a crash,
+                    # hence, the earlier results of name are out of date
+                    self.index.pop(name, None)
+                    invalid = True
+                    continue
+                self.index[name] = location
+        return invalid
+
+    def _check_record(self, record, sizes):
+        """
+        Return the location of a record of the index, or None if it is not
+        the location of the results of a contract in its segment.
+        """
+        location = (record.get('segment'), record.get('offset'),
+                    record.get('length'))
+        if not isinstance(record.get('name'), str) or not all(
+                isinstance(value, int) for value in location):
+            return None
+        segment, offset, length = location
+        if segment < 0 or offset < 0 or length <= 0:
+            return None
+        if segment not in sizes:
+            path = self._get_segment(segment)
+            sizes[segment] = (os.path.getsize(path)
+                              if os.path.isfile(path) else 0)
+        if offset + length > sizes[segment]:
+            return None
+        # The results are JSON lines
+        if (self._read((segment, offset, 1)) != b'{'
+                or self._read((segment, offset + length - 1, 1)) != b'\n'):
+            return None
+        return location
+
+    def _repair(self, invalid):
+        """
+        Rewrite the index without its records that are not valid, if any,
+        and truncate the last segment after its last valid record.
+        """
+        if invalid:
+            tmp = self._get_index() + '.tmp'
+            with open(tmp, 'w') as f:
+                for name, (segment, offset, length) in sorted(
+                        self.index.items(), key=lambda item: item[1]):
+                    f.write(json.dumps(
+                        {'name': name, 'segment': segment, 'offset': offset,
+                         'length': length}) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self._get_index())
+        path = self._get_segment(self._segment)
+        end = max((offset + length
+                   for segment, offset, length in self.index.values()
+                   if segment == self._segment), default=0)
+        if os.path.isfile(path) and os.path.getsize(path) > end:
+            os.truncate(path, end)
+
+    def _ends_with_newline(self):
+        with open(self._get_index(), 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def _open_segment(self):
+        if self._segment_file is not None:
+            if self._segment_file.tell() < self.segment_size:
+                return self._segment_file
+            os.fsync(self._segment_file.fileno())
+            self._segment_file.close()
+            self._segment += 1
+        self._segment_file = open(self._get_segment(self._segment), 'ab')
+        if self._segment_file.tell() >= self.segment_size:
+            return self._open_segment()
+        return self._segment_file
+
+    def put(self, name, results):
+        """Append the (file, JSON results) pairs of results as name."""
+        out = io.StringIO()
+        write_results_jsonl(results, out)
+        data = out.getvalue().encode('utf-8')
+        with self._lock:
+            segment_file = self._open_segment()
+            offset = segment_file.tell()
+            segment_file.write(data)
+            segment_file.flush()
+            location = (self._segment, offset, len(data))
+            self._index_file.write(json.dumps(
+                {'name': name, 'segment': location[0], 'offset': offset,
+                 'length': location[2]}) + '\n')
+            self._index_file.flush()
+            self.index[name] = location
+            self._pending += 1
+            if self._pending >= SYNC_EVERY:
+                self._sync()
+
+    def _sync(self):
+        if self._segment_file is not None:
+            os.fsync(self._segment_file.fileno())
+        os.fsync(self._index_file.fileno())
+        self._pending = 0
+
+    def put_file(self, name, path):
+        """Append the results of a results file as name."""
+        self.put(name, iter_results(path))
+
+    def _read(self, location):
+        segment, offset, length = location
+        fd = self._fds.get(segment)
+        if fd is None:
+            fd = self._fds[segment] = os.open(self._get_segment(segment),
+                                              os.O_RDONLY)
+        return os.pread(fd, length, offset)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def names(self):
+        return list(self.index)
+
+    def get(self, name):
+        """Return the results of name as a dict (as load_results), or None."""
+        location = self.index.get(name)
+        if location is None:
+            return None
+        return dict(_read_records(self._read(location)))
+
+    def scan(self):
+        """
+        Yield the (name, results) of every contract in the order of the
+        segments, where results are the (file, JSON results) pairs.
+        """
+        for name, location in sorted(self.index.items(),
+                                     key=lambda item: item[1]):
+            yield name, list(_read_records(self._read(location)))
+
+    def close(self):
+        if self._index_file is not None:
+            with self._lock:
+                self._sync()
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds = {}
+        for f in (self._segment_file, self._index_file, self._lock_file):
+            if f is not None:
+                f.close()
+        self._segment_file = self._index_file = self._lock_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ResultsDirectory:
+    """A directory of results files, i.e., one <name>.json(l) per contract."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def get(self, name):
+        path = find_results(self.directory, name)
+        return None if path is None else load_results(path)
+
+    def scan(self):
+        for f in sorted(os.listdir(self.directory)):
+            # Not the journal of run_parser.py or temporary files
+            if f.endswith(RESULTS_EXTENSIONS):
+                path = os.path.join(self.directory, f)
+                yield get_results_name(path), list(iter_results(path))
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_results(directory):
+    """Return the results of directory, either a store or results files."""
+    if is_store(directory):
+        return ResultsStore(directory)
+    return ResultsDirectory(directory)
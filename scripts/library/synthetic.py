@@ -0,0 +1,194 @@
+"""
+A generator of synthetic Solidity corpora, e.g., for benchmark_parser.py.
+
+A corpus is a directory of files, each with a number of contracts of a
+number of functions. A function has an inline assembly fragment with
+probability density, and a fragment has a number of Yul statements, whose
+constructs (let, if, switch, for, function) are drawn with the weights of
+mix. A share of the files (duplicates) are exact copies of other files of
+the corpus, as the duplicate contracts of the dataset. The same parameters
+and seed always generate the same corpus.
+"""
+import os
+import random
+
+
+CONSTRUCTS = ('let', 'if', 'switch', 'for', 'function')
+
+MIXES = {
+    'mixed': dict.fromkeys(CONSTRUCTS, 1),
+    'let': {'let': 1},
+    'if': {'let': 1, 'if': 3},
+    'switch': {'let': 1, 'switch': 3},
+    'for': {'let': 1, 'for': 3},
+    'function': {'let': 1, 'function': 3},
+}
+
+# The default parameters of generate_corpus
+DEFAULTS = {
+    'files': 8,
+    'contracts': 2,
+    'functions': 8,
+    'density': 0.5,
+    'statements': 10,
+    'mix': 'mixed',
+    'duplicates': 0.0,
+    'seed': 0,
+}
+
+NULLARY = ('caller', 'callvalue', 'gas', 'timestamp', 'number')
+UNARY = ('iszero', 'not', 'mload', 'sload', 'calldataload')
+BINARY = ('add', 'sub', 'mul', 'div', 'and', 'or', 'xor', 'shl', 'shr',
+          'lt', 'gt', 'eq')
+
+
+def parse_mix(mix):
+    """
+    Return the weights of the constructs of mix, either a name of MIXES or
+    comma-separated construct=weight pairs (e.g., "let=2,switch=1").
+    """
+    if mix in MIXES:
+        return MIXES[mix]
+    weights = {}
+    for item in mix.split(','):
+        construct, _, weight = item.partition('=')
+        construct = construct.strip()
+        if construct not in CONSTRUCTS:
+            raise ValueError(f"unknown construct {construct!r} in mix")
+        weights[construct] = float(weight) if weight else 1.0
+    if not any(weights.values()):
+        raise ValueError(f"mix {mix!r} has no positive weights")
+    return weights
+
+
+class _Fragment:
+    """The Yul statements of a single inline assembly fragment."""
+
+    def __init__(self, rng, weights):
+        self.rng = rng
+        self.constructs = list(weights)
+        self.weights = list(weights.values())
+        self.variables = []
+        self.functions = 0
+        self.lines = []
+
+    def variable(self):
+        return self.rng.choice(self.variables)
+
+    def literal(self):
+        return self.rng.choice(('0', '1', '0x20', '0x40', '0xff', '256'))
+
+    def expression(self, depth=0):
+        r = self.rng.random()
+        if depth >= 2 or r < 0.3:
+            return self.variable() if r < 0.2 else self.literal()
+        if r < 0.4:
+            return f"{self.rng.choice(NULLARY)}()"
+        if r < 0.6:
+            return f"{self.rng.choice(UNARY)}({self.expression(depth + 1)})"
+        return (f"{self.rng.choice(BINARY)}({self.expression(depth + 1)}, "
+                f"{self.expression(depth + 1)})")
+
+    def assignment(self):
+        return f"{self.variable()} := {self.expression()}"
+
+    def add(self, indent, line):
+        self.lines.append('    ' * indent + line)
+
+    def add_statement(self, indent):
+        construct = self.rng.choices(self.constructs, self.weights)[0]
+        if construct == 'let':
+            name = f"v{len(self.variables)}"
+            self.add(indent, f"let {name} := {self.expression()}")
+            self.variables.append(name)
+        elif construct == 'if':
+            self.add(indent, f"if {self.expression()} {{")
+            self.add(indent + 1, self.assignment())
+            self.add(indent, "}")
+        elif construct == 'switch':
+            self.add(indent, f"switch {self.expression()}")
+            for case in range(self.rng.randint(1, 3)):
+                self.add(indent, f"case {case} {{ {self.assignment()} }}")
+            self.add(indent, f"default {{ {self.assignment()} }}")
+        elif construct == 'for':
+            i = f"i{len(self.variables)}"
+            self.add(indent, f"for {{ let {i} := 0 }} lt({i}, "
+                             f"{self.rng.randint(2, 32)}) "
+                             f"{{ {i} := add({i}, 1) }} {{")
+            self.add(indent + 1, f"{self.variable()} := add("
+                                 f"{self.variable()}, {i})")
+            self.add(indent, "}")
+        else:
+            name = f"h{self.functions}"
+            self.functions += 1
+            self.add(indent, f"function {name}(x, y) -> z {{")
+            self.add(indent + 1, f"z := {self.rng.choice(BINARY)}(x, y)")
+            self.add(indent, "}")
+            self.add(indent, f"{self.variable()} := {name}("
+                             f"{self.expression(1)}, {self.expression(1)})")
+
+    def generate(self, statements, indent):
+        self.add(indent, "let v0 := add(a, b)")
+        self.variables.append('v0')
+        for _ in range(statements):
+            self.add_statement(indent)
+        self.add(indent, f"mstore(0x40, {self.variable()})")
+        return self.lines
+
+
+def generate_source(rng, name, contracts=2, functions=8, density=0.5,
+                    statements=10, mix='mixed'):
+    """
+    Return the source code of a file with contracts contracts, and the
+    number of its inline assembly fragments.
+    """
+    weights = parse_mix(mix)
+    lines = ["// SPDX-License-Identifier: MIT", "pragma solidity ^0.8.0;"]
+    fragments = 0
+    for c in range(contracts):
+        lines += ["", f"contract {name}C{c} {{",
+                  "    uint256 private total;"]
+        for f in range(functions):
+            lines += ["",
+                      f"    function f{f}(uint256 a, uint256 b) public "
+                      f"returns (uint256 r) {{",
+                      "        r = a + b * total;"]
+            if rng.random() < density:
+                fragments += 1
+                lines.append("        assembly {")
+                lines += _Fragment(rng, weights).generate(statements, 3)
+                lines.append("        }")
+            lines += ["        total = r;", "    }"]
+        lines.append("}")
+    return '\n'.join(lines) + '\n', fragments
+
+
+def generate_corpus(directory, files=8, contracts=2, functions=8,
+                    density=0.5, statements=10, mix='mixed', duplicates=0.0,
+                    seed=0):
+    """
+    Write a corpus of files .sol files to directory (see the module
+    docstring), and return its size: the number of files, unique files,
+    bytes, and inline assembly fragments.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    copies = min(files - 1, round(files * duplicates)) if files else 0
+    unique = files - copies
+    sources = []
+    size = {'files': files, 'unique': unique, 'bytes': 0, 'fragments': 0}
+    for i in range(files):
+        if i < unique:
+            source, fragments = generate_source(
+                rng, f"Synthetic{i}", contracts, functions, density,
+                statements, mix)
+            sources.append((source, fragments))
+        else:
+            source, fragments = rng.choice(sources)
+        data = source.encode('utf-8')
+        with open(os.path.join(directory, f"synthetic_{i:05d}.sol"),
+                  'wb') as f:
+            f.write(data)
+        size['bytes'] += len(data)
+        size['fragments'] += fragments
+    return size
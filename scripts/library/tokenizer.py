@@ -0,0 +1,112 @@
+"""
+A pure-Python tokenizer for Solidity source code.
+
+It mirrors the token boundaries, lines, columns, and character offsets of
+the ANTLR lexer of solidity-parser (SolidityLexer), skipping whitespace and
+comments, but it does not classify keywords. Use is_identifier and
+is_plain_identifier to check how the grammar treats a word.
+"""
+import re
+
+
+WORD = 'word'
+NUMBER = 'number'
+STRING = 'string'
+HEX = 'hex'
+SYMBOL = 'symbol'
+EOF = 'eof'
+
+# Words that SolidityLexer does not lex as Identifier.
+KEYWORDS = frozenset("""
+    pragma as import from contract interface library is error using for
+    struct modifier function returns event enum address mapping memory
+    storage calldata if else try catch while unchecked assembly do return
+    throw emit revert var bool string byte new after delete let switch case
+    default callback override abstract immutable anonymous break constant
+    continue leave external indexed internal payable private public virtual
+    pure type view constructor fallback receive
+    true false
+    wei gwei szabo finney ether seconds minutes hours days weeks years
+    final in inline match null of relocatable static typeof
+""".split())
+
+# Keywords that the grammar accepts as identifiers (rule identifier).
+IDENTIFIER_KEYWORDS = frozenset([
+    'from', 'error', 'calldata', 'revert', 'callback', 'leave', 'payable',
+    'constructor', 'receive'
+])
+
+NUMBER_UNITS = frozenset([
+    'wei', 'gwei', 'szabo', 'finney', 'ether', 'seconds', 'minutes', 'hours',
+    'days', 'weeks', 'years'
+])
+
+_ELEMENTARY_TYPE = re.compile(
+    r'(?:u?int(?:8|16|24|32|40|48|56|64|72|80|88|96|104|112|120|128|136|144'
+    r'|152|160|168|176|184|192|200|208|216|224|232|240|248|256)?'
+    r'|bytes(?:[1-9]|[12][0-9]|3[0-2])?|u?fixed(?:[0-9]+x[0-9]+)?)$'
+)
+
+_TOKEN = re.compile(r'''
+    (?P<ws>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<hex>hex(?:"[0-9a-fA-F_]*"|'[0-9a-fA-F_]*'))
+  | (?P<string>(?:unicode)?(?:"(?:\\.|[^"\r\n\\])*"|'(?:\\.|[^'\r\n\\])*'))
+  | (?P<number>[0-9]+\.[0-9]+\.[0-9]+
+      |0[xX][0-9a-fA-F_]+
+      |(?:[0-9][0-9_]*|[0-9_]*\.[0-9][0-9_]*)(?:[eE]-?[0-9][0-9_]*)?)
+  | (?P<word>[a-zA-Z$_][a-zA-Z0-9$_]*)
+  | (?P<symbol><<=|>>=|:=|=:|->|=>|==|!=|<=|>=|&&|\|\||\+\+|--|<<|>>|\*\*
+      |[-+*/%&|^]=|.)
+''', re.VERBOSE | re.DOTALL)
+
+
+class Token:
+    """A token with the same location attributes as an ANTLR token."""
+    __slots__ = ('type', 'text', 'start', 'stop', 'line', 'column')
+
+    def __init__(self, type, text, start, stop, line, column):
+        self.type = type
+        self.text = text
+        self.start = start  # offset of the first character
+        self.stop = stop  # offset of the last character (inclusive)
+        self.line = line  # 1-based
+        self.column = column  # 0-based
+
+    def __repr__(self):
+        return "Token({!r}, {!r}, {}:{})".format(
+            self.type, self.text, self.line, self.column)
+
+
+def tokenize(text):
+    """
+    Return the list of tokens of text. The last token is always an EOF
+    token.
+    """
+    tokens = []
+    line = 1
+    line_start = 0
+    for match in _TOKEN.finditer(text):
+        kind = match.lastgroup
+        start, end = match.span()
+        if kind != 'ws' and kind != 'comment':
+            tokens.append(Token(kind, match.group(), start, end - 1,
+                                line, start - line_start))
+        newlines = text.count('\n', start, end)
+        if newlines:
+            line += newlines
+            line_start = text.rindex('\n', start, end) + 1
+    tokens.append(Token(EOF, '<EOF>', len(text), len(text) - 1,
+                        line, len(text) - line_start))
+    return tokens
+
+
+def is_plain_identifier(text):
+    """Check if SolidityLexer would lex text as an Identifier token."""
+    return (text[:1].isalpha() or text[:1] in '$_') and \
+        text not in KEYWORDS and not _ELEMENTARY_TYPE.match(text)
+
+
+def is_identifier(text):
+    """Check if text matches the identifier rule of the grammar."""
+    return text in IDENTIFIER_KEYWORDS or is_plain_identifier(text)
@@ -0,0 +1,163 @@
+"""
+A client for analyze_contracts.py --serve workers.
+
+WorkerPool starts N worker processes (or connects to workers that listen
+to Unix sockets), and fans requests out to them. Every worker is a
+long-lived process, hence, the interpreter startup, the imports, and the
+ANTLR caches are paid once per worker instead of once per file.
+"""
+import json
+import os
+import queue
+import socket
+import subprocess
+import sys
+import threading
+
+
+ANALYZE_CONTRACTS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'analyze_contracts.py')
+
+
+class WorkerError(Exception):
+    pass
+
+
+class Worker:
+    """A worker process that reads requests from stdin."""
+
+    def __init__(self, args=()):
+        self.args = list(args)
+        self.process = None
+        self.start()
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [sys.executable, ANALYZE_CONTRACTS, '--serve'] + self.args,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            encoding='utf-8')
+        self.infile = self.process.stdout
+        self.outfile = self.process.stdin
+
+    def request(self, request):
+        """Send a request and return its response."""
+        try:
+            self.outfile.write(json.dumps(request) + '\n')
+            self.outfile.flush()
+            line = self.infile.readline()
+        except (BrokenPipeError, ConnectionError) as e:
+            raise WorkerError(str(e))
+        if not line:
+            raise WorkerError("worker exited")
+        return json.loads(line)
+
+    def restart(self):
+        self.close()
+        self.start()
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            self.outfile.close()
+        except BrokenPipeError:
+            pass
+        self.process.wait()
+        self.process = None
+
+
+class SocketWorker(Worker):
+    """A worker that listens to a Unix socket (--serve --socket path)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.sock = None
+        self.start()
+
+    def start(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+        self.infile = self.sock.makefile('r', encoding='utf-8')
+        self.outfile = self.sock.makefile('w', encoding='utf-8')
+
+    def close(self):
+        if self.sock is None:
+            return
+        self.outfile.close()
+        self.infile.close()
+        self.sock.close()
+        self.sock = None
+
+
+class WorkerPool:
+    """
+    Fan requests out to workers, either N new worker processes started with
+    the extra arguments args of analyze_contracts.py (e.g., ['-f']), or the
+    workers listening to sockets.
+    """
+
+    def __init__(self, workers=1, args=(), sockets=None):
+        if sockets:
+            self.workers = [SocketWorker(path) for path in sockets]
+        else:
+            self.workers = [Worker(args) for _ in range(workers)]
+
+    def imap_unordered(self, requests):
+        """
+        Yield the responses of requests in the order they are finished.
+        A request is a dict (see handle_request in analyze_contracts.py) or
+        the path of a file. Requests without an id get their index as id.
+        If a worker process dies, the response of its request is an error,
+        and the worker is restarted.
+        """
+        requests = iter(enumerate(requests))
+        lock = threading.Lock()
+        responses = queue.Queue()
+
+        def run(worker):
+            try:
+                while True:
+                    with lock:
+                        try:
+                            i, request = next(requests)
+                        except StopIteration:
+                            break
+                    if not isinstance(request, dict):
+                        request = {'path': request}
+                    request.setdefault('id', i)
+                    try:
+                        responses.put(worker.request(request))
+                    except WorkerError as e:
+                        responses.put({'id': request['id'],
+                                       'error': f"WorkerError: {e}"})
+                        worker.restart()
+            except Exception as e:
+                responses.put(e)
+            responses.put(None)
+
+        threads = [threading.Thread(target=run, args=(worker,), daemon=True)
+                   for worker in self.workers]
+        for t in threads:
+            t.start()
+        running = len(threads)
+        while running:
+            response = responses.get()
+            if response is None:
+                running -= 1
+            elif isinstance(response, Exception):
+                raise response
+            else:
+                yield response
+        for t in threads:
+            t.join()
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,230 @@
+"""
+A hand-written recursive-descent parser for inline assembly (Yul) that
+works on the tokens of library.tokenizer.
+
+It follows the inline assembly rules of the solidity-parser grammar and
+records the same constructs as InlineAssemblyVisitor in
+analyze_contracts.py, i.e., it calls fragment.add_call for every call and
+fragment.add for definitions, functions, assignments, label_definitions,
+if_stmts, switch_stmts, and for_stmts. Tokens that cannot start an
+assembly item are skipped, which approximates the single-token deletion of
+the ANTLR error strategy.
+"""
+from library.tokenizer import WORD, NUMBER, STRING, HEX, NUMBER_UNITS, \
+    is_identifier
+
+
+# Keywords that can be called like an identifier (rule assemblyCall).
+CALL_KEYWORDS = ('return', 'address', 'byte')
+LITERALS = (NUMBER, STRING, HEX)
+
+
+class YulParser:
+
+    def __init__(self, tokens, first, last, fragment):
+        self.tokens = tokens
+        self.pos = first
+        self.end = last + 1
+        self.fragment = fragment
+
+    # start helper functions
+
+    def _peek(self, offset=0):
+        pos = self.pos + offset
+        if pos < self.end:
+            return self.tokens[pos]
+        return None
+
+    def _text(self, offset=0):
+        tok = self._peek(offset)
+        return tok.text if tok is not None else None
+
+    def _accept(self, text):
+        if self._text() == text:
+            self.pos += 1
+            return True
+        return False
+
+    def _is_identifier(self, offset=0):
+        tok = self._peek(offset)
+        return tok is not None and tok.type == WORD and \
+            is_identifier(tok.text)
+
+    def _is_literal(self, offset=0):
+        tok = self._peek(offset)
+        return tok is not None and tok.type in LITERALS
+
+    def _identifier_list(self):
+        while self._is_identifier():
+            self.pos += 1
+            if not self._accept(','):
+                break
+
+    def _identifier_or_list(self):
+        if self._accept('('):
+            self._identifier_list()
+            self._accept(')')
+        elif self._is_identifier():
+            self.pos += 1
+            if self._text() == '.' and self._is_identifier(1):
+                self.pos += 2
+
+    # end helper functions
+
+    def inline_assembly_statement(self):
+        """'assembly' StringLiteralFragment? assemblyBlock"""
+        self._accept('assembly')
+        while self.pos < self.end and self._text() != '{':
+            self.pos += 1
+        self.block()
+
+    def block(self):
+        if not self._accept('{'):
+            return
+        while self.pos < self.end and self._text() != '}':
+            start = self.pos
+            self.item()
+            if self.pos == start:
+                self.pos += 1
+        self._accept('}')
+
+    def item(self):
+        tok = self._peek()
+        text = tok.text
+        if text == '{':
+            self.block()
+        elif text == 'let':
+            self.local_definition()
+        elif text == 'switch':
+            self.switch()
+        elif text == 'function':
+            self.function_definition()
+        elif text == 'for':
+            self.for_loop()
+        elif text == 'if':
+            self.if_statement()
+        elif text in ('break', 'continue'):
+            self.pos += 1
+        elif text == '=:':
+            # assemblyStackAssignment
+            self.pos += 1
+            if self._is_identifier():
+                self.pos += 1
+        elif text == 'assembly':
+            # subAssembly
+            self.pos += 1
+            if self._is_identifier():
+                self.pos += 1
+            self.block()
+        elif text == '(':
+            self.assignment()
+        elif tok.type in LITERALS:
+            self.pos += 1
+            if tok.type == NUMBER and self._text() in NUMBER_UNITS:
+                self.pos += 1
+        elif self._is_identifier():
+            following = self._text(1)
+            if following == ':=':
+                self.assignment()
+            elif following == ':':
+                self.pos += 2
+                self.fragment.add('label_definitions')
+            elif following == '.' and self._is_identifier(2):
+                if self._text(3) == ':=':
+                    self.assignment()
+                else:
+                    self.pos += 3
+            elif following == '(':
+                self.expression()
+            else:
+                # A lone identifier is an item on its own and not a call.
+                self.pos += 1
+        elif text in CALL_KEYWORDS:
+            self.expression()
+
+    def expression(self):
+        tok = self._peek()
+        if tok is None:
+            return
+        if tok.type in LITERALS:
+            self.pos += 1
+        elif self._is_identifier() and self._text(1) == '.' and \
+                self._is_identifier(2):
+            # assemblyMember
+            self.pos += 3
+        elif self._is_identifier() or tok.text in CALL_KEYWORDS:
+            self.pos += 1
+            self.fragment.add_call(tok.text)
+            if self._accept('('):
+                if self._text() != ')':
+                    self.expression()
+                while self._accept(','):
+                    self.expression()
+                self._accept(')')
+
+    def local_definition(self):
+        self.pos += 1
+        self._identifier_or_list()
+        if self._accept(':='):
+            self.expression()
+        self.fragment.add('definitions')
+
+    def assignment(self):
+        self._identifier_or_list()
+        if self._accept(':='):
+            self.expression()
+        self.fragment.add('assignments')
+
+    def switch(self):
+        self.pos += 1
+        self.expression()
+        while self._text() in ('case', 'default'):
+            if self._text() == 'case':
+                self.pos += 1
+                if self._is_literal():
+                    self.pos += 1
+            else:
+                self.pos += 1
+            self.block()
+        self.fragment.add('switch_stmts')
+
+    def function_definition(self):
+        self.pos += 1
+        if self._is_identifier():
+            self.pos += 1
+        if self._accept('('):
+            self._identifier_list()
+            self._accept(')')
+        if self._accept('->'):
+            self._identifier_list()
+        self.block()
+        self.fragment.add('functions')
+
+    def for_loop(self):
+        self.pos += 1
+        self._block_or_expression()
+        self.expression()
+        self._block_or_expression()
+        self.block()
+        self.fragment.add('for_stmts')
+
+    def if_statement(self):
+        self.pos += 1
+        self.expression()
+        self.block()
+        self.fragment.add('if_stmts')
+
+    def _block_or_expression(self):
+        if self._text() == '{':
+            self.block()
+        else:
+            self.expression()
+
+
+def parse_assembly(tokens, first, last, fragment):
+    """
+    Parse the inline assembly statement tokens[first:last + 1] and record
+    its constructs into fragment.
+    """
+    YulParser(tokens, first, last, fragment).inline_assembly_statement()
+    return fragment
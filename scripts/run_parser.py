@@ -0,0 +1,399 @@
+"""
+Parse every contract of a directory (e.g., ${TARGET}/assembly), i.e., every
+.sol file or directory of .sol files, and save the results of each one to
+<address>.json in the output directory (e.g., ${TARGET}/parser).
+
+The contracts are taken from a shared queue by N long-lived workers, so that
+a slow contract keeps only its own worker busy. They are queued largest first
+(see library/scheduling.py), so that the last ones to finish are small. By
+default, the workers are analyze_contracts.py --serve processes (see
+library/workers.py), which keep the parser warm across contracts. Options of
+analyze_contracts.py that are about a whole run (-p, -j, --profile,
+--save-stats) are run as one analyze_contracts.py process per contract
+instead, as run_parser.sh did.
+
+The state of every contract is recorded in a journal (see
+library/journal.py), and the results files are written atomically. As
+run_parser.sh did, the contracts that already have results are skipped.
+With --resume, the journal decides instead: a contract is parsed again if it
+has not been completed, or if it has changed since. The results of a
+contract without a journal record (e.g., of run_parser.sh, which could be
+truncated by a crash) are read, and the contract is parsed again if they are
+not valid.
+
+With --store, the results are appended to a segmented store in the output
+directory (see library/store.py) instead of one file per contract.
+"""
+import argparse
+import csv
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from tqdm import tqdm
+
+from analyze_contracts import get_parser, get_input_files, save_results
+from library.journal import Journal, hash_input
+from library.results import JSONL_EXTENSION, get_results_name, \
+    load_results
+from library.scheduling import order_largest_first, read_costs
+from library.store import ResultsStore
+from library.workers import ANALYZE_CONTRACTS, Worker, WorkerError
+
+
+# Options of analyze_contracts.py that make no sense for a batch of
+# contracts
+UNSUPPORTED = ('save', 'serve', 'socket', 'retry_quarantine',
+               'profile_summary', 'merge_stats')
+
+# The default journal, in the output directory
+JOURNAL = '.journal'
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        description='Parse all the contracts of a directory.')
+    parser.add_argument(
+        "input_dir",
+        help="Directory with the contracts (.sol files or directories)"
+    )
+    parser.add_argument("output_dir", help="Directory for the results")
+    parser.add_argument(
+        "--timings",
+        metavar="CSV",
+        help="Append the parse time of every contract to this CSV file "
+             "(columns file and total)"
+    )
+    parser.add_argument(
+        "--order-by",
+        metavar="CSV",
+        help="Dispatch the contracts by decreasing parse time recorded in "
+             "this --timings (or analyze_contracts.py --profile) CSV file, "
+             "if it exists, instead of by decreasing size"
+    )
+    parser.add_argument(
+        "--journal",
+        help=f"Journal of the run (default: output_dir/{JOURNAL})"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Parse the contracts that have not been completed by earlier "
+             "runs with the same journal (e.g., after a crash), or that have "
+             "changed since, instead of the contracts without results"
+    )
+    parser.add_argument(
+        "--store",
+        action="store_true",
+        help="Save the results to a segmented store in output_dir (see "
+             "library/store.py) instead of one file per contract"
+    )
+    parser.add_argument(
+        "processes", type=int, help="Number of workers"
+    )
+    parser.add_argument(
+        "options",
+        nargs=argparse.REMAINDER,
+        help="Options of analyze_contracts.py, e.g., --max-cpu 300 "
+             "--quarantine quarantine.jsonl"
+    )
+    args = parser.parse_args()
+    if args.processes < 1:
+        parser.error("processes must be at least 1")
+    check_options(parser, args.options)
+    return args
+
+
+def check_options(parser, options):
+    """
+    Check the analyze_contracts.py options of a batch, or exit with an error
+    of parser.
+    """
+    analyze_parser = get_parser()
+    for option in options:
+        name = option.split('=', 1)[0]
+        # Swallowed by options, as they follow processes
+        if (name in parser._option_string_actions
+                and name not in analyze_parser._option_string_actions):
+            parser.error(f"{name} is an option of {parser.prog}, put runner "
+                         "options before PROCESSES")
+    analyze = analyze_parser.parse_args(options)
+    for option in UNSUPPORTED:
+        if getattr(analyze, option):
+            parser.error(f"--{option.replace('_', '-')} is not supported "
+                         "by run_parser.py")
+    if analyze.file is not None:
+        parser.error(f"unexpected argument {analyze.file}")
+
+
+def get_output(output_dir, path, jsonl=False):
+    """Return the results file of the contract path (a file or directory)."""
+    name = os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+    return os.path.join(
+        output_dir, name + (JSONL_EXTENSION if jsonl else '.json'))
+
+
+class ServeRunner:
+    """
+    Parse contracts with an analyze_contracts.py --serve worker started
+    with options, i.e., the options of analyze_contracts.py, and parsed.
+    With a store, the results are saved to the store, i.e., out is the name
+    of the contract.
+    """
+
+    def __init__(self, options, parsed, store=None):
+        self.analyze = parsed
+        self.store = store
+        # --jsonl is about the results files, which the runner writes
+        self.worker = Worker([o for o in options if o != '--jsonl'])
+
+    def run(self, path, out):
+        """
+        Parse the files of path and save their results to out. Return None,
+        or an error message. Files over the CPU time budget are skipped (and
+        quarantined by the worker), as analyze_contracts.py does. A file
+        over the memory budget is quarantined too, but the contract fails
+        and the worker is restarted, to release the memory.
+        """
+        results = []
+        for f in get_input_files(path):
+            request = {'path': f, 'code': self.analyze.code,
+                       'fragment_code': self.analyze.code
+                       or self.analyze.fragment_code}
+            try:
+                response = self.worker.request(request)
+            except WorkerError as e:
+                self.worker.restart()
+                return f"{f}: WorkerError: {e}"
+            if 'error' in response:
+                if response['error'].startswith('BudgetExceeded: RSS'):
+                    self.worker.restart()
+                    return f"{f}: {response['error']}"
+                if response['error'].startswith('BudgetExceeded:'):
+                    continue
+                return f"{f}: {response['error']}"
+            results.append((response['file'], response['results']))
+        if self.store is not None:
+            self.store.put(out, results)
+        else:
+            save_results(results, out, self.analyze.jsonl)
+        return None
+
+    def close(self):
+        self.worker.close()
+
+
+class ProcessRunner:
+    """
+    Parse every contract with a new analyze_contracts.py process. With a
+    store, the results are saved to a temporary file and then to the store.
+    """
+
+    def __init__(self, options, parsed, store=None):
+        self.options = options
+        self.analyze = parsed
+        self.store = store
+
+    def run(self, path, out):
+        save = out
+        if self.store is not None:
+            save = os.path.join(
+                self.store.directory, out + '.tmp'
+                + (JSONL_EXTENSION if self.analyze.jsonl else '.json'))
+        process = subprocess.run(
+            [sys.executable, ANALYZE_CONTRACTS, '-s', save, path]
+            + self.options, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            encoding='utf-8')
+        if process.stdout.strip():
+            tqdm.write(process.stdout.rstrip())
+        if process.returncode != 0:
+            lines = process.stderr.strip().splitlines()
+            return (f"{path}: exit code {process.returncode}"
+                    + (f": {lines[-1]}" if lines else ""))
+        if self.store is not None:
+            self.store.put_file(out, save)
+            os.remove(save)
+        return None
+
+    def close(self):
+        pass
+
+
+class Timings:
+    """Append the parse times of the contracts to a CSV file."""
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            self._write(('file', 'total'))
+
+    def _write(self, row):
+        with open(self.path, 'a', newline='') as f:
+            csv.writer(f).writerow(row)
+
+    def add(self, path, seconds):
+        self._write((path, f"{seconds:.6f}"))
+
+
+def needs_processes(options):
+    """Check if the options are about whole runs of analyze_contracts.py."""
+    return (options.print or options.jobs > 1 or options.profile is not None
+            or options.save_stats is not None)
+
+
+def is_valid(out, store=None):
+    """Check if the results out (a file, or a name in store) can be read."""
+    try:
+        if store is not None:
+            store.get(out)
+        else:
+            load_results(out)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return False
+    return True
+
+
+def run(paths, output_dir, processes, options, journal=None, resume=False,
+        timings=None, order_by=None, store=False):
+    """
+    Parse the contracts paths into output_dir with processes workers and the
+    options of analyze_contracts.py, record their state in the journal file
+    (by default, in output_dir), and append their times to the timings CSV.
+    The contracts that have results are skipped or, with resume, the
+    contracts that the journal has completed. The results of the contracts
+    without a journal record are skipped only if they are valid. With store,
+    output_dir is a segmented store (see library/store.py).
+    Return the numbers of parsed and skipped contracts, and the (path,
+    error) pairs of the contracts that failed, including the contracts left
+    by workers that stopped.
+    """
+    analyze = get_parser().parse_args(options)
+    os.makedirs(output_dir, exist_ok=True)
+    runner_class = ProcessRunner if needs_processes(analyze) else ServeRunner
+
+    journal = Journal(journal or os.path.join(output_dir, JOURNAL))
+    exists = os.path.isfile
+    results_store = None
+    if store:
+        results_store = ResultsStore(output_dir, write=True)
+        exists = results_store.__contains__
+    outputs = {}
+    skipped = 0
+    for path in paths:
+        out = get_output(output_dir, path, analyze.jsonl)
+        if results_store is not None:
+            # The name of the contract in the store
+            out = get_results_name(out)
+        if resume and path in journal:
+            done = journal.is_completed(path, out, exists)
+        else:
+            done = exists(out) and (path in journal
+                                    or is_valid(out, results_store))
+        if done:
+            skipped += 1
+            continue
+        outputs[path] = out
+    costs = None
+    if order_by and os.path.isfile(order_by):
+        costs = read_costs(order_by)
+    tasks = queue.Queue()
+    for path in order_largest_first(list(outputs), costs):
+        tasks.put((path, outputs[path]))
+    total = tasks.qsize()
+    timings = Timings(timings) if timings else None
+    print(f"Contracts: {total + skipped} (already parsed: {skipped})")
+
+    failures = []
+    # The number of parsed contracts, and the errors of stopped workers
+    parsed = [0]
+    stopped = []
+    lock = threading.Lock()
+    progress = tqdm(total=total, unit='contract')
+
+    def work():
+        try:
+            runner = runner_class(options, analyze, results_store)
+        except Exception as e:
+            with lock:
+                stopped.append(f"{type(e).__name__}: {e}")
+            return
+        try:
+            while True:
+                try:
+                    path, out = tasks.get_nowait()
+                except queue.Empty:
+                    break
+                started = time.perf_counter()
+                input_hash = None
+                try:
+                    input_hash = hash_input(path)
+                    journal.start(path, input_hash)
+                    error = runner.run(path, out)
+                except Exception as e:
+                    error = f"{path}: {type(e).__name__}: {e}"
+                elapsed = time.perf_counter() - started
+                try:
+                    if error is None:
+                        journal.complete(path, input_hash, out)
+                    else:
+                        journal.fail(path, input_hash, error)
+                except Exception as e:
+                    # The contract is not recorded, hence, not completed
+                    error = f"{path}: journal: {type(e).__name__}: {e}"
+                with lock:
+                    if error is None:
+                        parsed[0] += 1
+                        tqdm.write(f"done: {out} ({elapsed:.1f}s)")
+                        if timings is not None:
+                            timings.add(path, elapsed)
+                    else:
+                        failures.append((path, error))
+                        tqdm.write(f"error: {error}")
+                    progress.update()
+        except Exception as e:
+            with lock:
+                stopped.append(f"{type(e).__name__}: {e}")
+        finally:
+            runner.close()
+
+    threads = [threading.Thread(target=work, daemon=True)
+               for _ in range(min(processes, total))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    progress.close()
+    for error in stopped:
+        print(f"error: worker stopped: {error}", file=sys.stderr)
+    while not tasks.empty():
+        path, _ = tasks.get_nowait()
+        failures.append((path, f"{path}: not parsed, every worker stopped"))
+    journal.close()
+    if results_store is not None:
+        results_store.close()
+    return parsed[0], skipped, failures
+
+
+def print_summary(parsed, skipped, failures):
+    print(f"Parsed: {parsed}, "
+          f"failed: {len(failures)}, skipped: {skipped}")
+    for path, error in failures:
+        print(f"  {error}", file=sys.stderr)
+
+
+def main():
+    args = get_args()
+    paths = [os.path.join(args.input_dir, entry)
+             for entry in sorted(os.listdir(args.input_dir))]
+    parsed, skipped, failures = run(
+        paths, args.output_dir, args.processes, args.options, args.journal,
+        args.resume, args.timings, args.order_by, args.store)
+    print_summary(parsed, skipped, failures)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
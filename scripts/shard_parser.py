@@ -0,0 +1,298 @@
+"""
+Parse the contracts of a list of paths (e.g., unique_paths.txt) on several
+nodes, one shard of the list per node.
+
+    shard      splits the list into K shards of about the same total size
+               (see library.scheduling.split_balanced), and writes them
+               (shard-<i>.txt) and a manifest (manifest.json) to a
+               directory, which is shared with (or copied to) the nodes.
+    run-shard  parses the contracts of shard i with run_parser.py into the
+               bundle directory bundle-<i>, i.e., the results files
+               (bundle-<i>/parser), the journal of the run, and a summary
+               (bundle-<i>/bundle.json) that is written last, hence, a
+               bundle without it is incomplete. Run it again with --resume
+               to parse only the contracts that have not been completed.
+               With --store, the results are saved to a segmented store
+               (see library/store.py).
+    reduce     checks that every shard has a complete bundle and copies
+               their results to one directory, i.e., the parser directory
+               of contains_assembly.py and create_csv.py, either as results
+               files or, with --store, as a segmented store.
+
+The shards can be run as separate local processes, e.g., to test a run.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+from analyze_contracts import save_results
+from library.results import JSONL_EXTENSION, RESULTS_EXTENSIONS
+from library.scanner import path_has_assembly
+from library.scheduling import split_balanced
+from library.store import ResultsStore, is_store, open_results
+import run_parser
+
+
+MANIFEST = 'manifest.json'
+MANIFEST_VERSION = 1
+BUNDLE = 'bundle.json'
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        description='Parse the contracts of a list of paths in shards.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    shard = commands.add_parser(
+        'shard', help='Split a list of paths into shards')
+    shard.add_argument(
+        "paths",
+        help="File with the paths of the contracts (files or directories), "
+             "one per line (e.g., unique_paths.txt)"
+    )
+    shard.add_argument("shards_dir", help="Directory for the shards")
+    shard.add_argument("shards", type=int, help="Number of shards")
+    shard.add_argument(
+        "--assembly-only",
+        action="store_true",
+        help="Keep only the contracts with inline assembly (see "
+             "find_assembly.py)"
+    )
+
+    run = commands.add_parser(
+        'run-shard', help='Parse the contracts of a shard into a bundle')
+    run.add_argument("shards_dir", help="Directory of the shards")
+    run.add_argument("index", type=int, help="Index of the shard")
+    run.add_argument(
+        "-o", "--output",
+        help="Bundle directory (default: shards_dir/bundle-<index>)"
+    )
+    run.add_argument(
+        "--resume",
+        action="store_true",
+        help="Parse only the contracts that have not been completed by an "
+             "earlier run of the shard"
+    )
+    run.add_argument(
+        "--store",
+        action="store_true",
+        help="Save the results to a segmented store"
+    )
+    run.add_argument("processes", type=int, help="Number of workers")
+    run.add_argument(
+        "options",
+        nargs=argparse.REMAINDER,
+        help="Options of analyze_contracts.py (see run_parser.py)"
+    )
+
+    reduce = commands.add_parser(
+        'reduce', help='Merge the bundles of the shards')
+    reduce.add_argument("shards_dir", help="Directory of the shards")
+    reduce.add_argument(
+        "parser_dir", help="Directory for the results (e.g., ${TARGET}/parser)"
+    )
+    reduce.add_argument(
+        "--bundles",
+        nargs="+",
+        metavar="DIR",
+        help="Bundle directories (default: shards_dir/bundle-<index>)"
+    )
+    reduce.add_argument(
+        "--move",
+        action="store_true",
+        help="Move the results files instead of copying them"
+    )
+    reduce.add_argument(
+        "--store",
+        action="store_true",
+        help="Save the results to a segmented store in parser_dir"
+    )
+    reduce.add_argument(
+        "--allow-failures",
+        action="store_true",
+        help="Merge the bundles even if some contracts failed"
+    )
+    args = parser.parse_args()
+    if args.command == 'shard' and args.shards < 1:
+        parser.error("shards must be at least 1")
+    if args.command == 'run-shard':
+        if args.processes < 1:
+            parser.error("processes must be at least 1")
+        run_parser.check_options(run, args.options)
+    return args
+
+
+def get_shard_file(index):
+    return f"shard-{index:05d}.txt"
+
+
+def get_bundle_dir(shards_dir, index):
+    return os.path.join(shards_dir, f"bundle-{index:05d}")
+
+
+def hash_paths(paths):
+    return hashlib.sha256('\n'.join(paths).encode('utf-8')).hexdigest()
+
+
+def write_json(data, path):
+    """Write data to path atomically."""
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def read_manifest(shards_dir):
+    with open(os.path.join(shards_dir, MANIFEST), 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        sys.exit(f"error: unsupported manifest version "
+                 f"{manifest.get('version')}")
+    return manifest
+
+
+def read_shard(shards_dir, shard):
+    """Return the paths of a shard of the manifest, checking its hash."""
+    paths = read_paths(os.path.join(shards_dir, shard['file']))
+    if hash_paths(paths) != shard['hash']:
+        sys.exit(f"error: {shard['file']} does not match the manifest")
+    return paths
+
+
+def read_paths(path):
+    with open(path, 'r') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def shard(args):
+    paths = list(dict.fromkeys(read_paths(args.paths)))
+    missing = [path for path in paths if not os.path.exists(path)]
+    for path in missing:
+        print(f"error: {path} does not exist", file=sys.stderr)
+    paths = [path for path in paths if os.path.exists(path)]
+    if args.assembly_only:
+        paths = [path for path in paths if path_has_assembly(path)]
+    names = {}
+    for path in paths:
+        output = run_parser.get_output('', path)
+        if output in names:
+            sys.exit(f"error: {names[output]} and {path} have the same "
+                     f"results file {output}")
+        names[output] = path
+
+    splits, sizes = split_balanced(paths, args.shards)
+    os.makedirs(args.shards_dir, exist_ok=True)
+    shards = []
+    for index, (split, size) in enumerate(zip(splits, sizes)):
+        split.sort()
+        name = get_shard_file(index)
+        with open(os.path.join(args.shards_dir, name), 'w') as f:
+            f.writelines(path + '\n' for path in split)
+        shards.append({'index': index, 'file': name, 'contracts': len(split),
+                       'bytes': size, 'hash': hash_paths(split)})
+    write_json({'version': MANIFEST_VERSION,
+                'paths': os.path.abspath(args.paths),
+                'contracts': len(paths), 'bytes': sum(sizes),
+                'shards': shards},
+               os.path.join(args.shards_dir, MANIFEST))
+    print(f"Contracts: {len(paths)}, missing: {len(missing)}, "
+          f"shards: {args.shards}")
+    for s in shards:
+        print(f"  {s['file']}: {s['contracts']} contracts, {s['bytes']} bytes")
+
+
+def run_shard(args):
+    manifest = read_manifest(args.shards_dir)
+    if not 0 <= args.index < len(manifest['shards']):
+        sys.exit(f"error: shard {args.index} is not in the manifest "
+                 f"({len(manifest['shards'])} shards)")
+    shard = manifest['shards'][args.index]
+    paths = read_shard(args.shards_dir, shard)
+    bundle = args.output or get_bundle_dir(args.shards_dir, args.index)
+    summary = os.path.join(bundle, BUNDLE)
+    if os.path.exists(summary):
+        # The bundle is incomplete until the run ends
+        os.remove(summary)
+    output_dir = os.path.join(bundle, 'parser')
+    parsed, skipped, failures = run_parser.run(
+        paths, output_dir, args.processes, args.options,
+        journal=os.path.join(bundle, run_parser.JOURNAL), resume=args.resume,
+        store=args.store)
+    run_parser.print_summary(parsed, skipped, failures)
+    write_json({'shard': args.index, 'hash': shard['hash'],
+                'contracts': len(paths), 'failed': len(failures),
+                'failures': [error for _, error in failures],
+                'options': args.options}, summary)
+    sys.exit(1 if failures else 0)
+
+
+def read_bundle(bundle, shard):
+    """Return the summary of a complete bundle of shard, or an error."""
+    try:
+        with open(os.path.join(bundle, BUNDLE), 'r') as f:
+            summary = json.load(f)
+    except FileNotFoundError:
+        return None, f"{bundle} is incomplete"
+    if summary['shard'] != shard['index'] or summary['hash'] != shard['hash']:
+        return None, f"{bundle} is not a bundle of {shard['file']}"
+    return summary, None
+
+
+def reduce(args):
+    manifest = read_manifest(args.shards_dir)
+    shards = manifest['shards']
+    bundles = args.bundles or [get_bundle_dir(args.shards_dir, s['index'])
+                               for s in shards]
+    if len(bundles) != len(shards):
+        sys.exit(f"error: {len(bundles)} bundles for {len(shards)} shards")
+    errors = []
+    for bundle, shard in zip(bundles, shards):
+        summary, error = read_bundle(bundle, shard)
+        if error is not None:
+            errors.append(error)
+        elif summary['failed'] and not args.allow_failures:
+            errors.append(f"{bundle}: {summary['failed']} contracts failed")
+    if errors:
+        for error in errors:
+            print(f"error: {error}", file=sys.stderr)
+        sys.exit(1)
+
+    os.makedirs(args.parser_dir, exist_ok=True)
+    transfer = shutil.move if args.move else shutil.copyfile
+    store = None
+    if args.store:
+        store = ResultsStore(args.parser_dir, write=True)
+    count = 0
+    for bundle in bundles:
+        directory = os.path.join(bundle, 'parser')
+        if store is not None or is_store(directory):
+            with open_results(directory) as results:
+                for name, contract_results in results.scan():
+                    if store is not None:
+                        store.put(name, contract_results)
+                    else:
+                        save_results(contract_results, os.path.join(
+                            args.parser_dir, name + JSONL_EXTENSION), True)
+                    count += 1
+            continue
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(RESULTS_EXTENSIONS):
+                transfer(os.path.join(directory, name),
+                         os.path.join(args.parser_dir, name))
+                count += 1
+    if store is not None:
+        store.close()
+    print(f"Results: {count} contracts (from {len(bundles)} bundles)")
+
+
+def main():
+    args = get_args()
+    {'shard': shard, 'run-shard': run_shard, 'reduce': reduce}[args.command](
+        args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Tests that the fast backend (see library/yul.py) has the same results as
+the ANTLR grammar.
+"""
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from analyze_contracts import AntlrBackend, FastBackend, parse_file, \
+    parse_source  # noqa: E402
+from library.synthetic import MIXES, generate_source  # noqa: E402
+
+
+LARGE = os.path.join(ROOT, 'tests', 'large.sol')
+
+
+def get_results(data):
+    results = data.to_json_results()
+    # Only the grammar has parse statistics
+    results.pop('parse_stats', None)
+    return results
+
+
+def test_large():
+    antlr = parse_file(LARGE, AntlrBackend())
+    fast = parse_file(LARGE, FastBackend())
+    assert get_results(fast) == get_results(antlr)
+
+
+@pytest.mark.parametrize('mix', sorted(MIXES))
+def test_synthetic(mix):
+    rng = random.Random(0)
+    for i in range(3):
+        source, fragments = generate_source(rng, f"Synthetic{i}", mix=mix)
+        antlr = parse_source('synthetic.sol', source, AntlrBackend())
+        fast = parse_source('synthetic.sol', source, FastBackend())
+        results = get_results(antlr)
+        assert sum(len(contract['fragments'])
+                   for contract in results['contracts'].values()) == fragments
+        assert get_results(fast) == results
@@ -0,0 +1,31 @@
+"""
+Tests of the budget of the parse of a file, which is exceeded at any point
+of the visit of its tree (see library/budget.py).
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from analyze_contracts import InlineAssemblyVisitor, parse  # noqa: E402
+from library.budget import BudgetExceeded  # noqa: E402
+
+
+LARGE = os.path.join(ROOT, 'tests', 'large.sol')
+
+
+def test_exceeded_in_statement(monkeypatch):
+    def visit(self, ctx):
+        raise BudgetExceeded("CPU time over 1 s", 1.0)
+
+    # Visited by visitSimpleStatement, which recovers from the errors of
+    # antlr4, but not from the budget
+    monkeypatch.setattr(InlineAssemblyVisitor,
+                        'visitVariableDeclarationStatement', visit)
+    with open(LARGE, 'r') as f:
+        source = f.read()
+    with pytest.raises(BudgetExceeded):
+        parse(LARGE, source, lean=False)
@@ -0,0 +1,34 @@
+"""
+Tests of the parse cache shared by several processes.
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = os.path.join(ROOT, 'scripts')
+sys.path.insert(0, SCRIPTS)
+
+from library.cache import ParseCache  # noqa: E402
+
+
+WRITER = """
+import sys
+from library.cache import ParseCache
+with ParseCache(sys.argv[1], timeout=1) as cache:
+    cache.put('other', {'results': 2})
+"""
+
+
+def test_shared_by_processes(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    with ParseCache(path, timeout=1) as cache:
+        # Pending results must not keep the cache locked
+        cache.put('key', {'results': 1})
+        process = subprocess.run([sys.executable, '-c', WRITER, path],
+                                 cwd=SCRIPTS, capture_output=True, text=True)
+        assert process.returncode == 0, process.stderr
+        assert cache.get('key') == {'results': 1}
+        assert cache.get('other') == {'results': 2}
+    with ParseCache(path) as cache:
+        assert cache.get('key') == {'results': 1}
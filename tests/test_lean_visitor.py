@@ -0,0 +1,61 @@
+"""
+Tests of the lean mode of InlineAssemblyVisitor, which builds Nodes only
+inside inline assembly.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+import analyze_contracts  # noqa: E402
+from analyze_contracts import InlineAssemblyVisitor, parse  # noqa: E402
+
+
+LARGE = os.path.join(ROOT, 'tests', 'large.sol')
+
+
+def parse_recording(monkeypatch, path, lean):
+    """
+    Parse path and return its data, the (type, start, stop) of every Node,
+    and the (start, stop) of every inline assembly statement.
+    """
+    nodes = []
+    fragments = []
+
+    class RecordingNode(analyze_contracts.Node):
+        def __init__(self, ctx, **kwargs):
+            super().__init__(ctx, **kwargs)
+            nodes.append((kwargs.get('type'), ctx.start.start, ctx.stop.stop))
+
+    visit = InlineAssemblyVisitor.visitInlineAssemblyStatement
+
+    def visit_recording(self, ctx):
+        fragments.append((ctx.start.start, ctx.stop.stop))
+        return visit(self, ctx)
+
+    monkeypatch.setattr(analyze_contracts, 'Node', RecordingNode)
+    monkeypatch.setattr(InlineAssemblyVisitor, 'visitInlineAssemblyStatement',
+                        visit_recording)
+    with open(path, 'r') as f:
+        data = parse(path, f.read(), lean=lean)
+    return data, nodes, fragments
+
+
+def test_no_nodes_outside_fragments(monkeypatch):
+    _, nodes, fragments = parse_recording(monkeypatch, LARGE, lean=True)
+    assert fragments
+    assert nodes
+    outside = [node for node in nodes
+               if not any(start <= node[1] and node[2] <= stop
+                          for start, stop in fragments)]
+    assert outside == []
+
+
+def test_lean_results(monkeypatch):
+    lean, _, _ = parse_recording(monkeypatch, LARGE, lean=True)
+    full, _, _ = parse_recording(monkeypatch, LARGE, lean=False)
+    lean, full = lean.to_json_results(), full.to_json_results()
+    # The parse times differ
+    del lean['parse_stats'], full['parse_stats']
+    assert lean == full
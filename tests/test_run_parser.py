@@ -0,0 +1,52 @@
+"""
+Tests of the runs of run_parser.py whose workers or journal fail.
+"""
+import os
+import shutil
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+import run_parser  # noqa: E402
+from library.journal import Journal  # noqa: E402
+
+
+LARGE = os.path.join(ROOT, 'tests', 'large.sol')
+
+
+def get_paths(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = str(tmp_path / f"contract{i}.sol")
+        shutil.copyfile(LARGE, path)
+        paths.append(path)
+    return paths
+
+
+def test_journal_errors(tmp_path, monkeypatch):
+    paths = get_paths(tmp_path, 2)
+
+    def complete(self, path, input_hash, output):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(Journal, 'complete', complete)
+    parsed, skipped, failures = run_parser.run(
+        paths, str(tmp_path / 'parser'), 1, ['-f'])
+    assert (parsed, skipped) == (0, 0)
+    assert sorted(path for path, _ in failures) == paths
+    assert all('No space left on device' in error for _, error in failures)
+
+
+def test_stopped_workers(tmp_path, monkeypatch):
+    paths = get_paths(tmp_path, 2)
+
+    class BrokenRunner:
+        def __init__(self, options, parsed, store=None):
+            raise OSError("Too many open files")
+
+    monkeypatch.setattr(run_parser, 'ServeRunner', BrokenRunner)
+    parsed, skipped, failures = run_parser.run(
+        paths, str(tmp_path / 'parser'), 2, ['-f'])
+    assert (parsed, skipped) == (0, 0)
+    assert sorted(path for path, _ in failures) == paths
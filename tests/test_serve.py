@@ -0,0 +1,34 @@
+"""
+Tests of the requests of analyze_contracts.py --serve.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from analyze_contracts import AntlrBackend, handle_request  # noqa: E402
+from library.cache import ParseCache  # noqa: E402
+
+
+LARGE = os.path.join(ROOT, 'tests', 'large.sol')
+
+
+def get_codes(response):
+    return [fragment['code']
+            for contract in response['results']['contracts'].values()
+            for fragment in contract['fragments']]
+
+
+def test_cached_source_request(tmp_path):
+    with open(LARGE, 'r') as f:
+        request = {'source': f.read(), 'fragment_code': True}
+    with ParseCache(str(tmp_path / 'cache.sqlite')) as cache:
+        first = handle_request(request, AntlrBackend(), cache)
+        # The second one is a cache hit, without a file to read the code of
+        # the fragments from
+        second = handle_request(request, AntlrBackend(), cache)
+    assert 'error' not in first and 'error' not in second
+    assert cache.hits == 1
+    assert get_codes(first)
+    assert get_codes(second) == get_codes(first)
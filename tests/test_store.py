@@ -0,0 +1,60 @@
+"""
+Tests of the crash recovery of the segmented results store.
+"""
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from library.store import INDEX, ResultsStore  # noqa: E402
+
+
+def get_results(name):
+    return [(name + '.sol', {'contracts': {}, 'lines': len(name)})]
+
+
+def write(directory, names):
+    with ResultsStore(directory, write=True) as store:
+        for name in names:
+            store.put(name, get_results(name))
+
+
+def check(directory, names):
+    with ResultsStore(directory) as store:
+        assert sorted(store.names()) == sorted(names)
+        for name in names:
+            assert store.get(name) == dict(get_results(name))
+        assert sorted(name for name, _ in store.scan()) == sorted(names)
+
+
+def test_unsynced_segment(tmp_path):
+    directory = str(tmp_path)
+    write(directory, ['a', 'b'])
+    # A crash before the end of b was synced
+    segment = os.path.join(directory, 'segment-00000.seg')
+    os.truncate(segment, os.path.getsize(segment) - 10)
+    check(directory, ['a'])
+    # New results must not make the record of b valid again
+    write(directory, ['c' * 100, 'd'])
+    check(directory, ['a', 'c' * 100, 'd'])
+    check(directory, ['a', 'c' * 100, 'd'])
+
+
+def test_invalid_records(tmp_path):
+    directory = str(tmp_path)
+    write(directory, ['a'])
+    segment = os.path.join(directory, 'segment-00000.seg')
+    size = os.path.getsize(segment)
+    with open(segment, 'ab') as f:
+        f.write(b'garbage\n')
+    with open(os.path.join(directory, INDEX), 'a') as f:
+        f.write(json.dumps({'name': 'b', 'segment': 0, 'offset': size,
+                            'length': 8}) + '\n')
+        f.write(json.dumps({'name': 'c', 'segment': '0'}) + '\n')
+        f.write('{"name": "d", "seg')
+    check(directory, ['a'])
+    write(directory, ['e'])
+    check(directory, ['a', 'e'])
+    assert os.path.getsize(segment) > size